@@ -0,0 +1,170 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from core.backtester import BackTester, bar_timestamps
+from core.strategy_loader import discover_strategies
+from data.history import DataFetcher
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+# Worker processes start clean rather than forked: the dashboard is multithreaded, and a forked
+# child can block forever on a lock another thread held at the fork. Workers attach to shared
+# memory by name, so they need nothing else from the parent. forkserver is POSIX only.
+POOL_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+class BacktestCancelled(Exception):
+    pass
+
+class SharedBars:
+    '''
+    Bar arrays published once in a shared memory block so worker processes
+    can read them without each getting a pickled copy.
+    Row 0 of the block is the UTC timestamp in ns, rows 1-5 are OHLCV.
+    '''
+    def __init__(self, data):
+        timestamps = data.index
+        if isinstance(timestamps, pd.MultiIndex):
+            timestamps = timestamps.get_level_values('timestamp')
+        timestamps = pd.DatetimeIndex(timestamps)
+
+        self.length = len(data)
+        self.tz = str(timestamps.tz) if timestamps.tz is not None else None
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, 6 * self.length * 8))
+        block = np.ndarray((6, self.length), dtype=np.float64, buffer=self.shm.buf)
+        block[0].view(np.int64)[:] = timestamps.asi8
+        for row, column in enumerate(PRICE_COLUMNS, start=1):
+            block[row] = data[column].to_numpy(dtype=float)
+        del block
+
+    def spec(self):
+        return {'name': self.shm.name, 'length': self.length, 'tz': self.tz}
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach_shared_bars(spec):
+    '''Map a SharedBars block in a worker. Returns (shm, timestamps, opens, highs, lows, closes, volumes).'''
+    # Pool workers share the parent's resource tracker, so the parent's unlink cleans this up
+    shm = shared_memory.SharedMemory(name=spec['name'])
+    block = np.ndarray((6, spec['length']), dtype=np.float64, buffer=shm.buf)
+    timestamps = pd.to_datetime(block[0].view(np.int64), utc=True)
+    if spec['tz']:
+        timestamps = timestamps.tz_convert(spec['tz'])
+    return (shm, timestamps.astype(object).to_numpy(), *block[1:])
+
+
+class SharedProgress:
+    '''
+    Progress of a run that its worker processes write and the parent reads, in shared memory:
+    the fraction of bars done for each of slots strategies, then a cancel flag.
+    Workers report through reporter(), which raises BacktestCancelled once cancel() is called.
+    '''
+    def __init__(self, slots):
+        self.slots = slots
+        self.shm = shared_memory.SharedMemory(create=True, size=8 * (slots + 1))
+        self.block = np.ndarray(slots + 1, dtype=np.float64, buffer=self.shm.buf)
+        self.block[:] = 0
+
+    def spec(self):
+        return {'name': self.shm.name, 'slots': self.slots}
+
+    def fraction(self):
+        return float(self.block[:-1].mean()) if self.slots else 0.0
+
+    def cancel(self):
+        self.block[-1] = 1
+
+    @property
+    def cancelled(self):
+        return bool(self.block[-1])
+
+    def close(self):
+        del self.block
+        self.shm.close()
+        self.shm.unlink()
+
+
+def progress_reporter(block, slot):
+    '''BackTester.on_progress writing strategy slot's fraction into a SharedProgress block.'''
+    def report(done, total):
+        if block[-1]:
+            raise BacktestCancelled()
+        block[slot] = done / total
+    return report
+
+
+def _backtest_arrays(arrays, strategy_name, strategy_kwargs, symbol, timeframe, starting_balance, on_progress=None):
+    strategy = discover_strategies()[strategy_name](**(strategy_kwargs or {}))
+    backtester = BackTester(strategy=strategy, starting_balance=starting_balance)
+    backtester.on_progress = on_progress
+    return backtester.run_arrays(symbol, timeframe, *arrays)
+
+
+def run_shared_backtest(bars_spec, strategy_name, strategy_kwargs, symbol, timeframe, starting_balance,
+                        progress_spec=None, slot=0):
+    shm, *arrays = attach_shared_bars(bars_spec)
+    progress_shm = on_progress = None
+    if progress_spec is not None:
+        progress_shm = shared_memory.SharedMemory(name=progress_spec['name'])
+        block = np.ndarray(progress_spec['slots'] + 1, dtype=np.float64, buffer=progress_shm.buf)
+        on_progress = progress_reporter(block, slot)
+    try:
+        return _backtest_arrays(arrays, strategy_name, strategy_kwargs, symbol, timeframe, starting_balance, on_progress)
+    finally:
+        del arrays
+        try:
+            shm.close()
+        except BufferError:
+            # A strategy kept a view of the bars, the mapping goes away with the process
+            pass
+        if progress_shm is not None:
+            del on_progress, block
+            try:
+                progress_shm.close()
+            except BufferError:
+                # A cancelled run's traceback can still hold the block
+                pass
+
+
+def run_backtests(strategy_names, symbol, timeframe, start, end, starting_balance=100000, max_workers=None,
+                  progress=None):
+    '''
+    Backtest several strategies over one fetch of the bar data, one process per strategy.
+    Returns {strategy_name: (pnl_history, trade_history, summary)}.
+    With a SharedProgress (one slot per strategy) even a single strategy runs in a
+    worker process, reports its progress there and stops with BacktestCancelled on cancel().
+    '''
+    data = DataFetcher().fetch(symbol, timeframe, start, end)
+    if data.empty:
+        raise ValueError(f"No data returned for {symbol} from {start} to {end}")
+    if progress is not None and progress.cancelled:
+        raise BacktestCancelled()
+
+    if len(strategy_names) == 1 and progress is None:
+        arrays = [bar_timestamps(data.index)] + [data[column].to_numpy() for column in PRICE_COLUMNS]
+        name = strategy_names[0]
+        return {name: _backtest_arrays(arrays, name, None, symbol, timeframe, starting_balance)}
+
+    results = {}
+    max_workers = max_workers or min(len(strategy_names), os.cpu_count() or 1)
+    with SharedBars(data) as bars, ProcessPoolExecutor(max_workers=max_workers, mp_context=POOL_CONTEXT) as pool:
+        progress_spec = progress.spec() if progress is not None else None
+        futures = {
+            pool.submit(run_shared_backtest, bars.spec(), name, None, symbol, timeframe, starting_balance,
+                        progress_spec, slot): name
+            for slot, name in enumerate(strategy_names)
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return {name: results[name] for name in strategy_names}
@@ -1,8 +1,19 @@
 from data.history import DataFetcher
+from data.bar_window import BarWindow
 from core.broker import Broker
+from strats.base_strategy import BUY, SELL
 import pandas as pd
 import numpy as np
-from collections import deque
+import copy
+
+# Bars simulated between two on_progress calls
+PROGRESS_BARS = 1000
+
+def bar_timestamps(index):
+    '''Bar timestamps as an object array of Timestamps, taken from the timestamp level of Alpaca's (symbol, timestamp) index.'''
+    if isinstance(index, pd.MultiIndex):
+        index = index.get_level_values('timestamp')
+    return index.astype(object).to_numpy()
 
 class BackTester:
     def __init__(self, strategy, starting_balance=100000):
@@ -11,60 +22,24 @@ class BackTester:
         self.broker = Broker(starting_balance)
         self.metrics = self.broker.get_metrics()
         self.starting_balance = starting_balance
+        self.on_progress = None # called with (bars done, total bars) every PROGRESS_BARS bars, may raise to abort
     
-    def run(self, symbol, timeframe, start, end):
+    def run(self, symbol, timeframe, start, end, vectorized=True):
         data = self.datafetcher.fetch(symbol, timeframe, start, end)
         if data.empty:
             raise ValueError(f"No data returned for {symbol} from {start} to {end}")
 
-        timestamps = data.index.to_numpy()
+        timestamps = bar_timestamps(data.index)
         opens = data['open'].to_numpy()
         highs = data['high'].to_numpy()
         lows = data['low'].to_numpy()
         closes = data['close'].to_numpy()
         volumes = data['volume'].to_numpy()
+        return self.run_arrays(symbol, timeframe, timestamps, opens, highs, lows, closes, volumes, vectorized=vectorized)
 
-        # Prepare a rolling window deque for the strategy
-        max_lookback = self.strategy.max_lookback
-        rolling_window = deque(maxlen=max_lookback)
-
-        for i in range(len(closes)):
-            ts, open, high, low, close, volume = timestamps[i], opens[i], highs[i], lows[i], closes[i], volumes[i]
-
-            rolling_window.append({
-                'timestamp': ts,
-                'open': open,
-                'high': high,
-                'low': low,
-                'close': close,
-                'volume': volume
-            })
-
-            self.metrics.record(ts, {symbol: close})
-
-            signal = self.strategy.generate_signals(rolling_window)
-            if not signal:
-                continue
-
-            ts, price, action, allocation = signal
-            if action == 'BUY':
-                self.broker.buy(symbol, price, allocation_percent=allocation, timestamp=ts)
-            elif action == 'SELL':
-                self.broker.sell(symbol, price, allocation_percent=allocation, timestamp=ts)
-
-        final_price = data['close'].iloc[-1]
-        summary = {
-            "Final Cash": round(self.metrics.cash, 2),
-            "Portfolio Value": round(self.metrics.portfolio_value({symbol: final_price}), 2),
-            "Realised PnL": round(self.metrics.get_realised_pnl(), 2),
-            "Unrealised PnL": round(self.metrics.get_unrealised_pnl({symbol: final_price}), 2),
-            "Total Return %": round(((self.metrics.portfolio_value({symbol: final_price}) / self.starting_balance) - 1) * 100, 2),
-            "Trades Executed": len(self.broker.trade_history),
-            "Win Rate %": round(self.metrics.win_rate() * 100, 2),
-            "Sharpe Ratio": round(self.metrics.sharpe_ratio(timeframe), 2),
-            "Max Drawdown %": round(self.metrics.max_drawdown() * 100, 2),
-            "Profit Factor": round(self.metrics.profit_factor(), 2)
-        }
+    def run_arrays(self, symbol, timeframe, timestamps, opens, highs, lows, closes, volumes, vectorized=True):
+        '''Run over bar arrays that were already fetched, e.g. shared between worker processes.'''
+        summary = self.simulate(symbol, timeframe, timestamps, opens, highs, lows, closes, volumes, vectorized=vectorized)
         pnl_history = self.metrics.get_pnl_dataframe().copy()
         if isinstance(pnl_history['timestamp'].iloc[0], tuple):
             pnl_history['timestamp'] = pnl_history['timestamp'].apply(lambda x: x[1])
@@ -74,3 +49,144 @@ class BackTester:
             trade_history['timestamp'] = trade_history['timestamp'].apply(lambda x: x[1])
             
         return pnl_history, trade_history, summary
+
+    def run_portfolio(self, symbols, timeframe, start, end, vectorized=True):
+        '''
+        Backtest the strategy on every symbol at once with one shared broker.
+        Bars are aligned into a timestamp x symbol matrix and positions are marked
+        to market across all symbols in one vector operation per bar.
+        '''
+        symbols = list(symbols)
+        data = self.datafetcher.fetch_many(symbols, timeframe, start, end)
+        if data.empty:
+            raise ValueError(f"No data returned for {symbols} from {start} to {end}")
+
+        close_matrix = data['close'].unstack('symbol').reindex(columns=symbols)
+        index = close_matrix.index
+        has_bar = close_matrix.notna().to_numpy()
+        prices = close_matrix.ffill().to_numpy()
+        timestamps = index.astype(object).to_numpy()
+        n, k = prices.shape
+
+        self.metrics.reserve(n)
+        self.metrics.set_universe(symbols)
+
+        # Each symbol's own bars and the matrix rows they land on
+        columns = []
+        for j, symbol in enumerate(symbols):
+            bars = close_matrix.index[has_bar[:, j]]
+            own = data.xs(symbol, level='symbol').reindex(bars) if len(bars) else data.iloc[:0]
+            arrays = (bars.astype(object).to_numpy(),) + tuple(own[c].to_numpy() for c in ('open', 'high', 'low', 'close', 'volume'))
+            columns.append((np.flatnonzero(has_bar[:, j]), arrays))
+
+        actions = None
+        if vectorized:
+            actions = np.zeros((n, k), dtype=np.int8)
+            allocations = np.zeros((n, k))
+            for j, (rows, arrays) in enumerate(columns):
+                signals = self.strategy.generate_signals_vectorized(*arrays)
+                if signals is None:
+                    actions = None
+                    break
+                actions[rows, j], allocations[rows, j] = signals
+
+        if actions is not None:
+            buy, sell = self.broker.buy, self.broker.sell
+            record = self.metrics.record_prices
+            for i in range(n):
+                record(timestamps[i], prices[i])
+                for j in np.flatnonzero(actions[i]):
+                    if actions[i, j] == BUY:
+                        buy(symbols[j], prices[i, j], allocation_percent=allocations[i, j], timestamp=timestamps[i])
+                    else:
+                        sell(symbols[j], prices[i, j], allocation_percent=allocations[i, j], timestamp=timestamps[i])
+        else:
+            # Per-bar fallback, each symbol gets its own copy of the strategy and its own window
+            strategies = [copy.deepcopy(self.strategy) for _ in symbols]
+            windows = [BarWindow(*arrays, max_lookback=self.strategy.max_lookback) for _, arrays in columns]
+            positions = np.cumsum(has_bar, axis=0) - 1
+            for i in range(n):
+                self.metrics.record_prices(timestamps[i], prices[i])
+                for j in np.flatnonzero(has_bar[i]):
+                    windows[j].advance(positions[i, j])
+                    signal = strategies[j].generate_signals(windows[j])
+                    if not signal:
+                        continue
+
+                    ts, price, action, allocation = signal
+                    if action == 'BUY':
+                        self.broker.buy(symbols[j], price, allocation_percent=allocation, timestamp=ts)
+                    elif action == 'SELL':
+                        self.broker.sell(symbols[j], price, allocation_percent=allocation, timestamp=ts)
+
+        final_prices = {symbol: price for symbol, price in zip(symbols, prices[-1]) if not np.isnan(price)}
+        summary = self.metrics.summary(final_prices, timeframe, len(self.broker.trade_log))
+        return self.metrics.get_pnl_dataframe().copy(), self.broker.trade_history.copy(), summary
+
+    def simulate(self, symbol, timeframe, timestamps, opens, highs, lows, closes, volumes, vectorized=True):
+        '''Run the strategy over the arrays and return only the summary, without building result frames.'''
+        self.metrics.reserve(len(closes))
+
+        signals = None
+        if vectorized:
+            signals = self.strategy.generate_signals_vectorized(timestamps, opens, highs, lows, closes, volumes)
+
+        if signals is not None:
+            actions, allocations = signals
+            self._run_vectorized(symbol, timestamps, closes, actions, allocations)
+        else:
+            self._run_per_bar(symbol, timestamps, opens, highs, lows, closes, volumes)
+
+        final_price = closes[-1]
+        return self.metrics.summary({symbol: final_price}, timeframe, len(self.broker.trade_log))
+
+    def _run_per_bar(self, symbol, timestamps, opens, highs, lows, closes, volumes):
+        # One window over the price arrays, moved forward each bar instead of copied
+        window = BarWindow(timestamps, opens, highs, lows, closes, volumes, max_lookback=self.strategy.max_lookback)
+
+        for start, end in self._progress_chunks(len(closes)):
+            for i in range(start, end):
+                ts, close = timestamps[i], closes[i]
+                window.advance(i)
+
+                self.metrics.record(ts, {symbol: close})
+
+                signal = self.strategy.generate_signals(window)
+                if not signal:
+                    continue
+
+                ts, price, action, allocation = signal
+                if action == 'BUY':
+                    self.broker.buy(symbol, price, allocation_percent=allocation, timestamp=ts)
+                elif action == 'SELL':
+                    self.broker.sell(symbol, price, allocation_percent=allocation, timestamp=ts)
+
+    def _run_vectorized(self, symbol, timestamps, closes, actions, allocations):
+        # Signals are precomputed, so each bar only marks to market and applies its action
+        actions = np.asarray(actions)
+        allocations = np.asarray(allocations, dtype=float)
+        if len(actions) != len(closes) or len(allocations) != len(closes):
+            raise ValueError(f'{self.strategy.name} returned {len(actions)} signals for {len(closes)} bars')
+
+        buy, sell = self.broker.buy, self.broker.sell
+        record = self.metrics.record
+        for start, end in self._progress_chunks(len(closes)):
+            for i in range(start, end):
+                ts, close = timestamps[i], closes[i]
+                record(ts, {symbol: close})
+
+                action = actions[i]
+                if action == BUY:
+                    buy(symbol, close, allocation_percent=allocations[i], timestamp=ts)
+                elif action == SELL:
+                    sell(symbol, close, allocation_percent=allocations[i], timestamp=ts)
+
+    def _progress_chunks(self, n):
+        '''The (start, end) bar ranges to simulate, one for the whole run unless on_progress wants reports.'''
+        if self.on_progress is None:
+            yield 0, n
+            return
+        for start in range(0, n, PROGRESS_BARS):
+            end = min(start + PROGRESS_BARS, n)
+            yield start, end
+            self.on_progress(end, n)
@@ -1,19 +1,20 @@
 import pandas as pd
 from core.metrics import MetricsTracker
+from core.trade_log import TradeLog
 
 class Broker:
     def __init__(self, starting_balance=100000):
         self.starting_balance = starting_balance
         self.cash = starting_balance
         self.positions = {} # {symbol: {'quantity': x, 'avg_price': y}}
-        self.trade_history = pd.DataFrame({
-            'timestamp': pd.Series(dtype='datetime64[ns]'),
-            'symbol': pd.Series(dtype='str'),
-            'side': pd.Series(dtype='str'),
-            'price': pd.Series(dtype='float'),
-            'quantity': pd.Series(dtype='float')
-        })
+        self.trade_log = TradeLog()
         self.metrics = MetricsTracker(starting_balance)
+        self.on_fill = None # called with (timestamp, symbol, side, price, quantity) after each fill
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['on_fill'] = None
+        return state
 
     def buy(self, symbol, price, allocation_percent=None, quantity=None, timestamp=None):
         if allocation_percent is not None:
@@ -35,14 +36,9 @@ class Broker:
         if timestamp is None:
             timestamp = pd.Timestamp.now()
 
-        new_trade = pd.DataFrame([{
-            'timestamp': timestamp,
-            'symbol': symbol,
-            'side': 'BUY',
-            'price': price,
-            'quantity': quantity
-        }])
-        self.trade_history = pd.concat([self.trade_history, new_trade], ignore_index=True)
+        self.trade_log.append(timestamp, symbol, 'BUY', price, quantity)
+        if self.on_fill is not None:
+            self.on_fill(timestamp, symbol, 'BUY', price, quantity)
         self.metrics.update_cash(self.cash)
         self.metrics.update_positions(self.positions.copy())
         # print(f'BUY {quantity} {symbol} @ {price:.2f}')
@@ -72,17 +68,36 @@ class Broker:
         if timestamp is None:
             timestamp = pd.Timestamp.now()
 
-        new_trade = pd.DataFrame([{
-            'timestamp': timestamp,
-            'symbol': symbol,
-            'side': 'SELL',
-            'price': price,
-            'quantity': quantity
-        }])
-        self.trade_history = pd.concat([self.trade_history, new_trade], ignore_index=True)
+        self.trade_log.append(timestamp, symbol, 'SELL', price, quantity)
+        if self.on_fill is not None:
+            self.on_fill(timestamp, symbol, 'SELL', price, quantity)
         self.metrics.update_cash(self.cash)
         self.metrics.update_positions(self.positions.copy())
         # print(f'SELL {quantity} {symbol} @ {price:.2f}')
 
+    def checkpoint(self, rows=0, trades=0):
+        '''
+        (state, history) for a live checkpoint, both copies: state is the cash, positions and
+        metrics totals, history the equity rows and trades recorded from rows / trades on.
+        '''
+        state = {'starting_balance': self.starting_balance, 'cash': self.cash,
+                 'positions': {symbol: dict(pos) for symbol, pos in self.positions.items()},
+                 'metrics': self.metrics.checkpoint_state()}
+        history = {'equity': self.metrics.rows_since(rows), 'trades': self.trade_log.columns_since(trades)}
+        return state, history
+
+    def restore(self, state, histories=()):
+        '''Load a checkpoint() state and the histories up to it, oldest first, into a new broker.'''
+        self.starting_balance = state['starting_balance']
+        self.cash = state['cash']
+        self.positions = state['positions']
+        self.metrics.restore(state['metrics'], [history['equity'] for history in histories])
+        for history in histories:
+            self.trade_log.extend(history['trades'])
+
+    @property
+    def trade_history(self):
+        return self.trade_log.to_dataframe()
+
     def get_metrics(self):
         return self.metrics
\ No newline at end of file
@@ -0,0 +1,161 @@
+import os
+import json
+import queue
+import pickle
+import shutil
+import threading
+from pathlib import Path
+import pandas as pd
+
+CHECKPOINT_DIR = Path(os.getenv('LIVE_CHECKPOINT_DIR', Path(__file__).resolve().parent.parent / 'cache' / 'live'))
+
+class Checkpointer:
+    '''
+    Crash-safe state of one live runner in its own directory:
+    journal.jsonl, an append-only log of the runner's bar closes and fills;
+    snapshot.pkl, the runner's compact state (strategy, cash, positions, metric totals
+    and bar window) as of a journal sequence number; and history.pkl, the equity rows
+    and trades each snapshot added, appended as one chunk per snapshot.
+    Every snapshot_every records the state is snapshotted and the journal restarts,
+    so a restore reads one snapshot, the history and a short tail. The event loop only
+    copies state and queues records, a writer thread pickles, writes and fsyncs once per batch.
+    '''
+    def __init__(self, directory, snapshot_every=50):
+        self.directory = Path(directory)
+        self.journal_path = self.directory / 'journal.jsonl'
+        self.snapshot_path = self.directory / 'snapshot.pkl'
+        self.history_path = self.directory / 'history.pkl'
+        self.snapshot_every = snapshot_every
+        self.seq = 0
+        self._since_snapshot = 0
+        self._history_end = (0, 0) # equity rows and trades already in history.pkl
+        self._queue = queue.Queue()
+        self._writer = None
+
+    def load(self):
+        '''(snapshot or None, its history chunks oldest first, journal records written after it).'''
+        snapshot = None
+        if self.snapshot_path.exists():
+            snapshot = pickle.loads(self.snapshot_path.read_bytes())
+        start = snapshot['seq'] if snapshot else 0
+        self._history_end = snapshot['history_end'] if snapshot else (0, 0)
+        histories = self._load_history(start)
+        records = []
+        if self.journal_path.exists():
+            with open(self.journal_path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn last line from a crash mid-write
+                        break
+                    if record['seq'] > start:
+                        records.append(record)
+        self.seq = records[-1]['seq'] if records else start
+        return snapshot, histories, records
+
+    def _load_history(self, start):
+        histories = []
+        if not self.history_path.exists():
+            return histories
+        with open(self.history_path, 'r+b') as f:
+            end = 0
+            while True:
+                try:
+                    history = pickle.load(f)
+                except Exception:
+                    # End of file, or a chunk torn by a crash mid-write
+                    break
+                # A chunk newer than the snapshot was written just before a crash, the journal still has it
+                if history['seq'] > start:
+                    break
+                histories.append(history)
+                end = f.tell()
+            # Later chunks are appended after the last good one
+            f.truncate(end)
+        return histories
+
+    def record_bar(self, bar):
+        self._append({'type': 'bar', 'timestamp': pd.Timestamp(bar.timestamp).isoformat(), 'open': float(bar.open),
+                      'high': float(bar.high), 'low': float(bar.low), 'close': float(bar.close),
+                      'volume': float(bar.volume)})
+
+    def record_fill(self, timestamp, symbol, side, price, quantity):
+        self._append({'type': 'fill', 'timestamp': pd.Timestamp(timestamp).isoformat(), 'symbol': symbol, 'side': side,
+                      'price': float(price), 'quantity': float(quantity)})
+
+    def _append(self, record):
+        self.seq += 1
+        record['seq'] = self.seq
+        self._since_snapshot += 1
+        self._put(('journal', record))
+
+    def snapshot_due(self):
+        return self._since_snapshot >= self.snapshot_every
+
+    def snapshot(self, strategy, broker, ring):
+        state, history = broker.checkpoint(*self._history_end)
+        self._history_end = (len(broker.metrics), len(broker.trade_log))
+        history['seq'] = self.seq
+        # The strategy is pickled now to match seq, everything else is already a copy
+        snapshot = {'seq': self.seq, 'strategy': pickle.dumps(strategy, protocol=pickle.HIGHEST_PROTOCOL),
+                    'broker': state, 'ring': ring.copy(), 'history_end': self._history_end}
+        self._since_snapshot = 0
+        self._put(('snapshot', (history, snapshot)))
+
+    def close(self, discard=False):
+        '''Flush and stop the writer. discard=True also deletes the checkpoint, e.g. when a session is ended on purpose.'''
+        if self._writer is not None:
+            self._queue.put(('close', None))
+            self._writer.join()
+            self._writer = None
+        if discard:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _put(self, item):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name=f'checkpoint-{self.directory.name}', daemon=True)
+            self._writer.start()
+        self._queue.put(item)
+
+    def _write_loop(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        journal = open(self.journal_path, 'a')
+        try:
+            while True:
+                items = [self._queue.get()]
+                while True:
+                    try:
+                        items.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                closing = False
+                for kind, payload in items:
+                    if kind == 'journal':
+                        journal.write(json.dumps(payload) + '\n')
+                    elif kind == 'snapshot':
+                        history, snapshot = payload
+                        with open(self.history_path, 'ab') as f:
+                            pickle.dump(history, f, protocol=pickle.HIGHEST_PROTOCOL)
+                            f.flush()
+                            os.fsync(f.fileno())
+                        tmp_path = self.snapshot_path.with_suffix('.pkl.tmp')
+                        with open(tmp_path, 'wb') as f:
+                            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+                            f.flush()
+                            os.fsync(f.fileno())
+                        os.replace(tmp_path, self.snapshot_path)
+                        # Everything journalled so far is in the snapshot
+                        journal.close()
+                        journal = open(self.journal_path, 'w')
+                    elif kind == 'close':
+                        closing = True
+                journal.flush()
+                os.fsync(journal.fileno())
+                if closing:
+                    return
+        except Exception as e:
+            print(f'[Checkpointer] Writing {self.directory} failed: {e}')
+        finally:
+            journal.close()
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+MAX_POINTS = 2000
+
+def relayout_range(relayout):
+    '''The x range a zoom or pan put in a graph's relayoutData, None for the full range.'''
+    if not relayout or relayout.get('xaxis.autorange'):
+        return None
+    if 'xaxis.range[0]' in relayout:
+        return relayout['xaxis.range[0]'], relayout['xaxis.range[1]']
+    if 'xaxis.range' in relayout:
+        return tuple(relayout['xaxis.range'])
+    return None
+
+
+def changes_x(relayout):
+    '''Whether relayoutData moved the x axis, rather than only the y axis or the autosize on load.'''
+    return bool(relayout) and any(key.startswith('xaxis.') for key in relayout)
+
+
+def _positions(x):
+    if pd.api.types.is_numeric_dtype(x):
+        return np.asarray(x, dtype=float), None
+    x = pd.DatetimeIndex(x)
+    return x.asi8, x.tz
+
+
+def _position(value, tz):
+    if tz is None and not isinstance(value, str):
+        return float(value)
+    value = pd.Timestamp(value)
+    # Plotly shows the series' wall time, so the range comes back naive in its timezone
+    if tz is not None and value.tzinfo is None:
+        value = value.tz_localize(tz)
+    return value.value
+
+
+def minmax_downsample(x, y, max_points=MAX_POINTS, x_range=None):
+    '''
+    Indices of about max_points points of the line (x, y) that keep its shape:
+    x is split into max_points // 2 equal-width buckets, each keeping its lowest
+    and highest point, plus the first and last points. x must be sorted.
+    x_range (x0, x1) keeps only that span, with one point either side so the line
+    reaches the edges; a span with at most max_points points is returned in full.
+    '''
+    positions, tz = _positions(x)
+    y = np.asarray(y, dtype=float)
+    start, end = 0, len(positions)
+    if x_range is not None:
+        x0, x1 = (_position(value, tz) for value in x_range)
+        start = max(np.searchsorted(positions, x0, side='left') - 1, 0)
+        end = min(np.searchsorted(positions, x1, side='right') + 1, len(positions))
+    if end - start <= max_points:
+        return np.arange(start, end)
+
+    positions, values = positions[start:end], y[start:end]
+    n_buckets = max(max_points // 2, 1)
+    span = positions[-1] - positions[0]
+    buckets = ((positions - positions[0]) / span * n_buckets).astype(np.int64) if span else np.zeros(len(positions), np.int64)
+    np.minimum(buckets, n_buckets - 1, out=buckets)
+
+    # Sorted by bucket then value, each bucket's first row is its min and its last its max
+    order = np.lexsort((values, buckets))
+    sorted_buckets = buckets[order]
+    firsts = np.flatnonzero(np.r_[True, sorted_buckets[1:] != sorted_buckets[:-1]])
+    lasts = np.r_[firsts[1:] - 1, len(order) - 1]
+    keep = np.unique(np.r_[0, order[firsts], order[lasts], len(positions) - 1])
+    return keep + start
+
+
+def downsample_frame(frame, x='timestamp', y='portfolio_value', max_points=MAX_POINTS, x_range=None):
+    '''(x values, y values) of frame's line after minmax_downsample.'''
+    if frame.empty:
+        return frame[x], frame[y]
+    rows = minmax_downsample(frame[x], frame[y], max_points=max_points, x_range=x_range)
+    return frame[x].iloc[rows], frame[y].iloc[rows]
@@ -0,0 +1,90 @@
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from core.backtest_pool import SharedProgress, BacktestCancelled
+
+class Job:
+    def __init__(self, job_id, slots):
+        self.id = job_id
+        self.slots = slots
+        self.status = 'queued' # queued, running, done, failed or cancelled
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.future = None
+        self._shared = None # SharedProgress while running
+
+
+class JobQueue:
+    '''
+    Backtests run in the background so a dashboard request only has to queue one.
+    Up to max_jobs run at once, each simulating its strategies in worker processes and
+    reporting the fraction of bars done through a SharedProgress; the rest wait their turn.
+    The job table lives in this process and keeps the last keep_jobs finished jobs.
+    '''
+    def __init__(self, max_jobs=2, keep_jobs=100):
+        self.jobs = {}
+        self.keep_jobs = keep_jobs
+        self._pool = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix='backtest-job')
+        self._lock = threading.Lock()
+
+    def submit(self, fn, slots, *args, **kwargs):
+        '''Queue fn(*args, progress=SharedProgress(slots), **kwargs) and return its job ID.'''
+        job = Job(uuid.uuid4().hex[:12], slots)
+        with self._lock:
+            self.jobs[job.id] = job
+            self._prune()
+        job.future = self._pool.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        with self._lock:
+            if job.status != 'queued':
+                return
+            job._shared = SharedProgress(job.slots)
+            job.status = 'running'
+        try:
+            result = fn(*args, progress=job._shared, **kwargs)
+            status, error = 'done', None
+        except BacktestCancelled:
+            result, status, error = None, 'cancelled', None
+        except Exception as e:
+            print(f'[JobQueue] Job {job.id} failed: {e}')
+            result, status, error = None, 'failed', str(e)
+        with self._lock:
+            job.progress = 1.0 if status == 'done' else job._shared.fraction()
+            job._shared.close()
+            job._shared = None
+            job.result, job.status, job.error = result, status, error
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            if job.status == 'queued':
+                job.future.cancel()
+                job.status = 'cancelled'
+            elif job.status == 'running':
+                job._shared.cancel()
+
+    def status(self, job_id):
+        '''{'status', 'progress' (0-1), 'position' in the queue, 'result', 'error'} of a job, None if unknown.'''
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job._shared is not None:
+                job.progress = job._shared.fraction()
+            position = 0
+            if job.status == 'queued':
+                position = sum(1 for j in self.jobs.values() if j.status == 'queued' and j.submitted <= job.submitted)
+            return {'status': job.status, 'progress': job.progress, 'position': position,
+                    'result': job.result, 'error': job.error}
+
+    def _prune(self):
+        finished = [j for j in self.jobs.values() if j.status in ('done', 'failed', 'cancelled')]
+        for job in sorted(finished, key=lambda j: j.submitted)[:max(0, len(finished) - self.keep_jobs)]:
+            del self.jobs[job.id]
@@ -0,0 +1,67 @@
+# Log-linear buckets: exact below 16 ns, then 8 per power of two (within 12.5%), capped at ~2^45 ns
+SUB_BUCKETS = 8
+BUCKETS = 44 * SUB_BUCKETS
+
+STAGES = ('ingest', 'queue', 'signal', 'fill')
+
+class LatencyHistogram:
+    '''Nanosecond latencies counted into a fixed set of buckets, so memory stays the same however many are recorded.'''
+    __slots__ = ('counts', 'count', 'max')
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.max = 0
+
+    def record(self, ns):
+        shift = ns.bit_length() - 4
+        index = (shift << 3) + (ns >> shift) if shift > 0 else ns
+        self.counts[index if index < BUCKETS else BUCKETS - 1] += 1
+        self.count += 1
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, q):
+        '''Upper edge of the bucket holding the q-th (0-100) percentile, in ns.'''
+        if not self.count:
+            return 0
+        rank = max(1, -(-self.count * q // 100))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                if index < 2 * SUB_BUCKETS:
+                    return index
+                shift = index // SUB_BUCKETS - 1
+                top = index % SUB_BUCKETS + SUB_BUCKETS
+                return min(((top + 1) << shift) - 1, self.max)
+        return self.max
+
+    def summary(self):
+        return {'count': self.count, 'p50_us': self.percentile(50) / 1000,
+                'p99_us': self.percentile(99) / 1000, 'max_us': self.max / 1000}
+
+
+class LatencyStats:
+    '''
+    Per-runner latency of the live path, each stage timed with perf_counter_ns:
+    ingest, from the feed receiving a trade or bar to the runner's handler (aggregation and batching);
+    queue, from an evaluation being triggered to generate_signals starting (off-loop executors);
+    signal, generate_signals itself; fill, from the feed receiving the event to the broker's fill.
+    '''
+    def __init__(self):
+        for stage in STAGES:
+            setattr(self, stage, LatencyHistogram())
+        self.queue_depth = 0  # evaluations in flight or waiting
+        self.max_queue_depth = 0
+
+    def set_queue_depth(self, depth):
+        self.queue_depth = depth
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+    def summary(self):
+        summary = {stage: getattr(self, stage).summary() for stage in STAGES}
+        summary['queue_depth'] = self.queue_depth
+        summary['max_queue_depth'] = self.max_queue_depth
+        return summary
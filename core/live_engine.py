@@ -0,0 +1,146 @@
+import os
+import json
+import asyncio
+from pathlib import Path
+from core.strategy_loader import discover_strategies
+
+SESSION_KEYS = ('symbol', 'timeframe', 'starting_balance')
+
+class LiveEngine:
+    '''
+    Owns the live session. start/stop/reconfigure only queue a command, so they are
+    safe to call from any thread; run() handles the commands one at a time and sleeps
+    on the queue in between, so a stopped engine costs nothing.
+    While started, the session task is the manager's hub supervising the stream.
+    With a session_path the running session's settings are saved there, and a
+    process that dies mid-session resumes it (and its runners' checkpoints) on run().
+    '''
+    def __init__(self, manager, session_path=None):
+        self.manager = manager
+        self.session_path = Path(session_path) if session_path else None
+        self.commands = asyncio.Queue()
+        self.config = None
+        self._session = None
+        self._loop = None
+
+    @property
+    def running(self):
+        return self._session is not None and not self._session.done()
+
+    def submit(self, command, config=None):
+        if self._loop is None:
+            self.commands.put_nowait((command, config))
+        else:
+            self._loop.call_soon_threadsafe(self.commands.put_nowait, (command, config))
+
+    def start(self, strategies, symbol, timeframe, starting_balance=100000):
+        self.submit('start', {'strategies': list(strategies), 'symbol': symbol,
+                              'timeframe': timeframe, 'starting_balance': starting_balance})
+
+    def reconfigure(self, strategies, symbol, timeframe, starting_balance=100000):
+        '''Apply new settings, keeping the runners that are unaffected by them.'''
+        self.submit('reconfigure', {'strategies': list(strategies), 'symbol': symbol,
+                                    'timeframe': timeframe, 'starting_balance': starting_balance})
+
+    def stop(self):
+        self.submit('stop')
+
+    def shutdown(self):
+        self.submit('shutdown')
+
+    def saved_session(self):
+        if self.session_path is None or not self.session_path.exists():
+            return None
+        try:
+            return json.loads(self.session_path.read_text())
+        except ValueError:
+            return None
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        saved = self.saved_session()
+        if saved is not None:
+            print(f'[LiveEngine] Resuming live session {saved}')
+            try:
+                self._start_session(saved)
+            except Exception as e:
+                print(f'[LiveEngine] Resume failed: {e}')
+        while True:
+            command, config = await self.commands.get()
+            try:
+                if command == 'start':
+                    await self._stop_session()
+                    self._start_session(config)
+                elif command == 'reconfigure':
+                    await self._reconfigure(config)
+                elif command == 'stop':
+                    await self._stop_session()
+                elif command == 'shutdown':
+                    # Leave the checkpoints so the next run() resumes from them
+                    await self._stop_session(discard=False)
+                    return
+                else:
+                    print(f'[LiveEngine] Unknown command: {command}')
+            except Exception as e:
+                print(f'[LiveEngine] {command} failed: {e}')
+
+    def _add_runner(self, name, config):
+        strategies = discover_strategies()
+        if name not in strategies:
+            print(f'[LiveEngine] Unknown strategy: {name}')
+            return None
+        strategy = strategies[name]()
+        try:
+            return self.manager.add_strategy(
+                strategy=strategy,
+                strategy_name=strategy.name,
+                symbol=config['symbol'],
+                timeframe=config['timeframe'],
+                starting_balance=config['starting_balance']
+            )
+        except ValueError as e:
+            print(f'[LiveEngine] Not running {name}: {e}')
+            return None
+
+    def _start_session(self, config):
+        self.manager.clear_all()
+        for name in config['strategies']:
+            self._add_runner(name, config)
+        self._save_session(config)
+        if self.manager.runners:
+            self._session = asyncio.create_task(self.manager.run_all())
+
+    def _save_session(self, config):
+        self.config = config
+        if self.session_path is not None:
+            self.session_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.session_path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(config))
+            os.replace(tmp_path, self.session_path)
+
+    async def _stop_session(self, discard=True):
+        if self._session is not None:
+            self._session.cancel()
+            # wait() rather than await so the session's CancelledError isn't raised here
+            await asyncio.wait([self._session])
+            self._session = None
+        self.manager.clear_all(discard=discard)
+        if discard and self.session_path is not None and self.session_path.exists():
+            self.session_path.unlink()
+
+    async def _reconfigure(self, config):
+        if not self.running or any(config[k] != self.config[k] for k in SESSION_KEYS):
+            await self._stop_session()
+            self._start_session(config)
+            return
+
+        current = [r['name'] for r in self.manager.runners]
+        for name in current:
+            if name not in config['strategies']:
+                self.manager.remove_strategy(name)
+        for name in config['strategies']:
+            if name not in current:
+                runner = self._add_runner(name, config)
+                if runner is not None:
+                    runner.subscribe()
+        self._save_session(config)
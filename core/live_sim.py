@@ -1,47 +1,194 @@
-import os
-from dotenv import load_dotenv
-from alpaca.data.live import StockDataStream
+import time
+import asyncio
+from time import perf_counter_ns
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from data.live import LiveFeeder
 from core.broker import Broker
+from core.latency import LatencyStats
+from core.backtest_pool import POOL_CONTEXT
+
+EVALUATION_POLICIES = ('trade', 'bar', 'throttle')
+EXECUTORS = ('inline', 'thread', 'process')
+
+# The strategy a 'process' executor's worker evaluates, kept there so its state persists between calls
+_worker_strategy = None
+
+def _init_signal_worker(strategy):
+    global _worker_strategy
+    _worker_strategy = strategy
+
+
+def _worker_generate_signals(window):
+    return _worker_strategy.generate_signals(window)
 
-load_dotenv()
 
 class LiveSimulator:
-    def __init__(self, feed, strategy, starting_balance=100000):
-        self.api_key = os.getenv('APCA_API_KEY_ID')
-        self.secret_key = os.getenv('APCA_API_SECRET_KEY')
-        self.stream = StockDataStream(self.api_key, self.secret_key)
+    '''
+    Trades one strategy on the completed timeframe bars and trades a shared LiveFeeder hands it.
+    evaluate_on controls how often generate_signals runs:
+    'trade' on every trade and bar close, 'bar' on bar close only,
+    'throttle' on bar close and at most once per throttle_ms on trades.
+    Off-loop executors (strategy.executor, see BaseStrategy) run one evaluation at a time
+    on a copy of the window while the feed keeps ingesting. Triggers arriving meanwhile
+    collapse into one follow-up evaluation, and a signal finishing after deadline_ms is
+    dropped. Both are counted in skipped_evaluations and stale_signals.
+    record_latency=True keeps per-stage LatencyStats (see latency_summary), otherwise
+    nothing is timed.
+    '''
+    def __init__(self, feed, strategy, timeframe='1Min', starting_balance=100000, evaluate_on='trade', throttle_ms=250,
+                 executor=None, deadline_ms=None, record_latency=False):
+        if evaluate_on not in EVALUATION_POLICIES:
+            raise ValueError(f'Invalid evaluate_on "{evaluate_on}". Must be one of {EVALUATION_POLICIES}.')
+        executor = executor or getattr(strategy, 'executor', 'inline')
+        if executor not in EXECUTORS:
+            raise ValueError(f'Invalid executor "{executor}". Must be one of {EXECUTORS}.')
         self.feed = feed
         self.strategy = strategy
+        self.timeframe = timeframe
         self.broker = Broker(starting_balance)
+        self.evaluate_on = evaluate_on
+        self.throttle = throttle_ms / 1000
+        self._last_evaluation = float('-inf')
+        self.executor = executor
+        self.deadline = (deadline_ms if deadline_ms is not None else getattr(strategy, 'signal_deadline_ms', 1000)) / 1000
+        self.stale_signals = 0
+        self.skipped_evaluations = 0
+        self._pool = None
+        self._inflight = None
+        self._next = None  # (symbol, triggered_at) waiting for the in-flight evaluation
+        self.checkpoint = None  # Checkpointer journalling this simulator's bar closes
+        self.latency = None
+        if record_latency:
+            self.latency = LatencyStats()
+            feed.timed = True
 
-    async def handle_bar(self, bar):
-        print(f'[DEBUG] Incoming 1-min bar from Alpaca → {bar.symbol} @ {bar.timestamp} | O:{bar.open} H:{bar.high} L:{bar.low} C:{bar.close} V:{bar.volume}')
-        final_bar = self.feed.handle_bar(bar)
+    def _evaluate(self, symbol, arrival=None):
+        if self.executor != 'inline':
+            self._schedule(symbol, arrival)
+            return
+        # Strategies see a view of the last max_lookback bars, not a copy of the feed
+        window = self.feed.window(symbol, self.strategy.max_lookback, self.timeframe)
+        if window is None:
+            return
+        self._last_evaluation = time.perf_counter()
+        if self.latency is None:
+            self._apply(symbol, self.strategy.generate_signals(window))
+            return
+        started = perf_counter_ns()
+        signal = self.strategy.generate_signals(window)
+        self.latency.signal.record(perf_counter_ns() - started)
+        self._apply(symbol, signal, arrival)
 
-        if final_bar:   
-            print(f'[DEBUG] Aggregated custom bar stored → {final_bar}')
-            ts, price = final_bar.timestamp, final_bar.close
-            self.broker.metrics.record(ts, {final_bar.symbol: price})
-            signal = self.strategy.generate_signals(self.feed.df.to_dict('records'))
-            if signal:
-                ts, price, action, allocation = signal
-                if action == 'BUY':
-                    self.broker.buy(final_bar.symbol, price, allocation_percent=allocation, timestamp=ts)
-                elif action == 'SELL':
-                    self.broker.sell(final_bar.symbol, price, allocation_percent=allocation, timestamp=ts)
+    def _schedule(self, symbol, arrival=None):
+        triggered = time.perf_counter()
+        if self._inflight is not None:
+            if self._next is not None:
+                self.skipped_evaluations += 1
+            self._next = (symbol, triggered, arrival)
+            if self.latency is not None:
+                self.latency.set_queue_depth(2)
+            return
+        if self.latency is not None:
+            self.latency.set_queue_depth(1)
+        self._inflight = asyncio.ensure_future(self._evaluate_off_loop(symbol, triggered, arrival))
 
+    async def _evaluate_off_loop(self, symbol, triggered, arrival=None):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                window = self.feed.window(symbol, self.strategy.max_lookback, self.timeframe)
+                if window is not None:
+                    # The feed keeps writing the ring meanwhile, so hand over a snapshot
+                    window = window.copy()
+                    self._last_evaluation = time.perf_counter()
+                    if self.latency is not None:
+                        self.latency.queue.record(int((self._last_evaluation - triggered) * 1e9))
+                    try:
+                        if self.executor == 'process':
+                            signal = await loop.run_in_executor(self._executor(), _worker_generate_signals, window)
+                        else:
+                            signal = await loop.run_in_executor(self._executor(), self.strategy.generate_signals, window)
+                    except Exception as e:
+                        print(f'[LiveSimulator] {self.strategy.name} generate_signals failed: {e}')
+                        signal = None
+                    if self.latency is not None:
+                        self.latency.signal.record(int((time.perf_counter() - self._last_evaluation) * 1e9))
+                    if time.perf_counter() - triggered > self.deadline:
+                        self.stale_signals += 1
+                    else:
+                        self._apply(symbol, signal, arrival)
+                if self._next is None:
+                    break
+                (symbol, triggered, arrival), self._next = self._next, None
+                if self.latency is not None:
+                    self.latency.set_queue_depth(1)
+        finally:
+            self._inflight = None
+            if self.latency is not None:
+                self.latency.set_queue_depth(0)
 
-    async def handle_trade(self, trade):
-        # print(f'[DEBUG] Trade received → {trade.symbol} | Price:{trade.price} Size:{trade.size} Time:{trade.timestamp}')
-        self.feed.handle_trade(trade)
-        signal = self.strategy.generate_signals(self.feed.df.to_dict('records'))
+    def _executor(self):
+        if self._pool is None:
+            if self.executor == 'process':
+                self._pool = ProcessPoolExecutor(max_workers=1, mp_context=POOL_CONTEXT,
+                                                 initializer=_init_signal_worker, initargs=(self.strategy,))
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'signals-{self.strategy.name}')
+        return self._pool
+
+    def close(self):
+        if self._inflight is not None:
+            self._inflight.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _apply(self, symbol, signal, arrival=None):
         if signal:
             ts, price, action, allocation = signal
+            fills = len(self.broker.trade_log)
             if action == 'BUY':
-                self.broker.buy(trade.symbol, price, allocation_percent=allocation, timestamp=ts)
+                self.broker.buy(symbol, price, allocation_percent=allocation, timestamp=ts)
             elif action == 'SELL':
-                self.broker.sell(trade.symbol, price, allocation_percent=allocation, timestamp=ts)
+                self.broker.sell(symbol, price, allocation_percent=allocation, timestamp=ts)
+            if arrival is not None and len(self.broker.trade_log) > fills:
+                self.latency.fill.record(perf_counter_ns() - arrival)
+
+    def latency_summary(self):
+        '''Per-stage p50/p99/max in µs, evaluation queue depth and dropped evaluations, or {} when not recorded.'''
+        if self.latency is None:
+            return {}
+        summary = self.latency.summary()
+        summary['stale_signals'] = self.stale_signals
+        summary['skipped_evaluations'] = self.skipped_evaluations
+        summary['dropped'] = self.stale_signals + self.skipped_evaluations
+        return summary
+
+    async def handle_bar(self, final_bar):
+        print(f'[DEBUG] Aggregated custom bar stored → {final_bar}')
+        arrival = None
+        if self.latency is not None:
+            arrival = self.feed.arrival_ns
+            self.latency.ingest.record(perf_counter_ns() - arrival)
+        ts, price = final_bar.timestamp, final_bar.close
+        self.broker.metrics.record(ts, {final_bar.symbol: price})
+        if self.checkpoint is not None:
+            self.checkpoint.record_bar(final_bar)
+        self._evaluate(final_bar.symbol, arrival)
+        if self.checkpoint is not None and self.checkpoint.snapshot_due():
+            self.checkpoint.snapshot(self.strategy, self.broker, self.feed.level(final_bar.symbol, self.timeframe).ring)
+
+    async def handle_trade(self, trade):
+        # print(f'[DEBUG] Trade received → {trade.symbol} | Price:{trade.price} Size:{trade.size} Time:{trade.timestamp}')
+        arrival = None
+        if self.latency is not None:
+            arrival = self.feed.arrival_ns
+            self.latency.ingest.record(perf_counter_ns() - arrival)
+        if self.evaluate_on == 'bar':
+            return
+        if self.evaluate_on == 'throttle' and time.perf_counter() - self._last_evaluation < self.throttle:
+            return
+        self._evaluate(trade.symbol, arrival)
   
 
     def get_broker(self):
@@ -0,0 +1,130 @@
+import os
+import time
+import asyncio
+from dotenv import load_dotenv
+from alpaca.data.live import StockDataStream
+
+load_dotenv()
+
+# StockDataStream internals _connect drives a single connection with, as of alpaca-py 0.42
+# (pinned in requirements.txt). A stream without them is left to its own _run_forever().
+STREAM_INTERNALS = ('_start_ws', '_send_subscribe_msg', '_consume')
+
+class MarketDataHub:
+    '''
+    One market data stream per process shared by every live runner.
+    The stream is subscribed to the union of the runners' symbols and each bar
+    or trade is dispatched to the handlers registered for its symbol.
+    run() supervises the connection: a dropped or failed one is retried after
+    min_backoff seconds, doubling up to max_backoff while it keeps failing.
+    '''
+    def __init__(self, stream=None, min_backoff=1, max_backoff=60):
+        self.api_key = os.getenv('APCA_API_KEY_ID')
+        self.secret_key = os.getenv('APCA_API_SECRET_KEY')
+        self.stream = stream or StockDataStream(self.api_key, self.secret_key)
+        self.bar_handlers = {} # {symbol: [async handler]}
+        self.trade_handlers = {} # {symbol: [async handler]}
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self._running = False
+        self._stopping = False
+        self._task = None
+        self._loop = None
+
+    def subscribe(self, symbol, on_bar=None, on_trade=None):
+        if on_bar is not None:
+            self._add_handler('bars', self.bar_handlers, symbol, on_bar)
+        if on_trade is not None:
+            self._add_handler('trades', self.trade_handlers, symbol, on_trade)
+
+    def _add_handler(self, channel, handlers, symbol, handler):
+        if symbol not in handlers:
+            handlers[symbol] = []
+            self._subscribe_stream(channel, symbol)
+        if handler not in handlers[symbol]:
+            handlers[symbol].append(handler)
+
+    def _subscribe_stream(self, channel, symbol):
+        dispatch = self._dispatch_bar if channel == 'bars' else self._dispatch_trade
+        if not getattr(self.stream, '_running', False):
+            subscribe = self.stream.subscribe_bars if channel == 'bars' else self.stream.subscribe_trades
+            subscribe(dispatch, symbol)
+            return
+        # A connected stream's subscribe_* blocks on its own loop, which deadlocks when
+        # called from that loop, so register directly and send the message without waiting
+        self.stream._handlers[channel][symbol] = dispatch
+        asyncio.run_coroutine_threadsafe(self.stream._send_subscribe_msg(), self.stream._loop)
+
+    def unsubscribe(self, symbol, on_bar=None, on_trade=None):
+        for handlers, handler in ((self.bar_handlers, on_bar), (self.trade_handlers, on_trade)):
+            if handler is not None and handler in handlers.get(symbol, []):
+                handlers[symbol].remove(handler)
+
+    async def _dispatch_bar(self, bar):
+        for handler in self.bar_handlers.get(bar.symbol, ()):
+            try:
+                await handler(bar)
+            except Exception as e:
+                print(f'[MarketDataHub] Bar handler failed for {bar.symbol}: {e}')
+
+    async def _dispatch_trade(self, trade):
+        for handler in self.trade_handlers.get(trade.symbol, ()):
+            try:
+                await handler(trade)
+            except Exception as e:
+                print(f'[MarketDataHub] Trade handler failed for {trade.symbol}: {e}')
+
+    async def _connect(self):
+        stream = self.stream
+        if not all(hasattr(stream, name) for name in STREAM_INTERNALS):
+            # Streams without a websocket, like ReplayStream, run their own loop, and so does
+            # a StockDataStream from an alpaca-py whose internals have changed
+            if isinstance(stream, StockDataStream):
+                print('[MarketDataHub] Unsupported alpaca-py stream, using its own reconnect loop')
+            await stream._run_forever()
+            return
+        # StockDataStream._run_forever retries a failed connection immediately and forever,
+        # so drive one connection here and leave the retry policy to run()
+        stream._loop = asyncio.get_running_loop()
+        stream._should_run = True
+        try:
+            await stream._start_ws()
+            await stream._send_subscribe_msg()
+            stream._running = True
+            await stream._consume()
+        finally:
+            stream._running = False
+            await stream.close()
+
+    async def run(self):
+        if self._running:
+            return
+        self._running = True
+        self._stopping = False
+        self._task = asyncio.current_task()
+        self._loop = asyncio.get_running_loop()
+        backoff = self.min_backoff
+        try:
+            while not self._stopping:
+                connected_at = time.monotonic()
+                try:
+                    await self._connect()
+                    # A connection only ends cleanly when stopped or when a replay runs out
+                    return
+                except Exception as e:
+                    print(f'[MarketDataHub] Stream connection failed: {e}')
+                if time.monotonic() - connected_at > self.max_backoff:
+                    backoff = self.min_backoff
+                print(f'[MarketDataHub] Reconnecting in {backoff}s')
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+        finally:
+            self._running = False
+            self._task = None
+
+    def stop(self):
+        '''Stop run() and close the connection. Safe to call from any thread.'''
+        self._stopping = True
+        task, loop = self._task, self._loop
+        if task is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(task.cancel)
@@ -1,19 +1,144 @@
+import copy
+import bisect
 import pandas as pd
 import numpy as np
 
+# Equity curve columns, kept apart from the running totals when checkpointed
+ROW_BUFFERS = ('_timestamps', '_portfolio_values', '_realised', '_unrealised', '_cash')
+
+def periods_per_year(timeframe):
+    # Assuming 252 trading days
+    periods_per_year = 252  # default daily
+    if timeframe.endswith('Min'):
+        minutes = int(timeframe[:-3])
+        periods_per_day = 6.5 * 60 / minutes  # 6.5 hours trading day
+        periods_per_year = 252 * periods_per_day
+    elif timeframe.endswith('H'):
+        hours = int(timeframe[:-1])
+        periods_per_day = 6.5 / hours
+        periods_per_year = 252 * periods_per_day
+    elif timeframe.endswith('D'):
+        days = int(timeframe[:-1])
+        periods_per_year = 252 / days
+    return periods_per_year
+
 class MetricsTracker:
     def __init__(self, starting_balance=100000):
         self.starting_balance = starting_balance
         self.cash = starting_balance
         self.positions = {} # {symbol: {'quantity': x, 'avg_price': y}}
-        self.pnl_history = []
         self.realised_pnl = 0.0
 
+        # Equity curve columns, grown geometrically as bars are recorded
+        self._size = 0
+        self._timestamps = np.empty(1024, dtype=object)
+        self._portfolio_values = np.empty(1024, dtype=float)
+        self._realised = np.empty(1024, dtype=float)
+        self._unrealised = np.empty(1024, dtype=float)
+        self._cash = np.empty(1024, dtype=float)
+        self._frame = None
+
+        # Position snapshots only where they change: row at which each one starts
+        self._position_rows = [0]
+        self._position_snapshots = [{}]
+
+        # Running statistics updated by record()
+        self._stat_count = 0
+        self._ret_mean = 0.0
+        self._ret_m2 = 0.0
+        self._prev_value = 0.0
+        self._prev_realised = 0.0
+        self._peak = 0.0
+        self._max_drawdown = 0.0
+        self._gains = 0.0
+        self._losses = 0.0
+        self._wins = 0
+        self._loss_count = 0
+
+        # Position vectors for record_prices(), aligned to set_universe()
+        self._universe = None
+        self._quantities = None
+        self._avg_prices = None
+
+    def __getstate__(self):
+        # The cached frame is rebuilt on demand, no need to pickle it
+        state = self.__dict__.copy()
+        state['_frame'] = None
+        return state
+
+    def checkpoint_state(self):
+        '''Copy of the running totals and positions, everything but the recorded rows.'''
+        skip = ROW_BUFFERS + ('_size', '_frame', '_position_rows', '_position_snapshots')
+        return copy.deepcopy({name: value for name, value in self.__dict__.items() if name not in skip})
+
+    def rows_since(self, start=0):
+        '''Copies of the rows recorded from row start on and of the position snapshots starting there.'''
+        first = bisect.bisect_left(self._position_rows, start)
+        rows = {name: getattr(self, name)[start:self._size].copy() for name in ROW_BUFFERS}
+        rows['position_rows'] = self._position_rows[first:]
+        rows['position_snapshots'] = self._position_snapshots[first:]
+        return rows
+
+    def restore(self, state, chunks=()):
+        '''Back to a checkpoint: checkpoint_state() and the rows_since() chunks it covers, oldest first.'''
+        self.__dict__.update(state)
+        self._size = 0
+        self._position_rows = [0]
+        self._position_snapshots = [{}]
+        self.reserve(sum(len(rows['_cash']) for rows in chunks))
+        for rows in chunks:
+            end = self._size + len(rows['_cash'])
+            for name in ROW_BUFFERS:
+                getattr(self, name)[self._size:end] = rows[name]
+            for row, snapshot in zip(rows['position_rows'], rows['position_snapshots']):
+                # A chunk starts with the snapshot the previous one ended on, maybe since replaced
+                if self._position_rows[-1] == row:
+                    self._position_snapshots[-1] = snapshot
+                else:
+                    self._position_rows.append(row)
+                    self._position_snapshots.append(snapshot)
+            self._size = end
+        self._frame = None
+
     def update_cash(self, cash):
         self.cash = cash
 
     def update_positions(self, positions):
         self.positions = positions.copy()
+        snapshot = {symbol: dict(pos) for symbol, pos in positions.items()}
+        if self._position_rows[-1] == self._size:
+            self._position_snapshots[-1] = snapshot
+        else:
+            self._position_rows.append(self._size)
+            self._position_snapshots.append(snapshot)
+        if self._universe is not None:
+            self._sync_position_vectors()
+
+    def set_universe(self, symbols):
+        '''Fix the symbol order used by record_prices() for a multi-symbol run.'''
+        self._universe = {symbol: i for i, symbol in enumerate(symbols)}
+        self._sync_position_vectors()
+
+    def _sync_position_vectors(self):
+        # Only rebuilt when positions change, not every bar
+        self._quantities = np.zeros(len(self._universe))
+        self._avg_prices = np.zeros(len(self._universe))
+        for symbol, pos in self.positions.items():
+            i = self._universe[symbol]
+            self._quantities[i] = pos['quantity']
+            self._avg_prices[i] = pos['avg_price']
+
+    def reserve(self, capacity):
+        '''Preallocate room for capacity recorded bars, e.g. the length of a backtest.'''
+        if capacity > len(self._cash):
+            self._resize(capacity)
+
+    def _resize(self, capacity):
+        for name in ROW_BUFFERS:
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
     
     def get_unrealised_pnl(self, market_prices):
         total = 0
@@ -33,64 +158,134 @@ class MetricsTracker:
 
     def record(self, timestamp, market_prices):
         realised = self.get_realised_pnl()
-        unrealised = self.get_unrealised_pnl(market_prices)
-        portfolio_val = self.portfolio_value(market_prices)
-        self.pnl_history.append({
-            'timestamp': timestamp,
-            'portfolio_value': portfolio_val,
-            'realised_pnl': realised,
-            'unrealised_pnl': unrealised,
-            'cash': self.cash,
-            'positions': self.positions.copy()
-        })
+        unrealised = 0.0
+        portfolio_val = self.cash
+        for symbol, pos in self.positions.items():
+            price = market_prices.get(symbol, pos['avg_price'])
+            unrealised += (price - pos['avg_price']) * pos['quantity']
+            portfolio_val += pos['quantity'] * price
+        self._append(timestamp, portfolio_val, realised, unrealised)
+
+    def record_prices(self, timestamp, prices):
+        '''
+        record() for a multi-symbol run: prices is an array in set_universe() order,
+        NaN where a symbol has no price yet. Marks every position in one vector operation.
+        '''
+        prices = np.where(np.isnan(prices), self._avg_prices, prices)
+        unrealised = ((prices - self._avg_prices) * self._quantities).sum()
+        portfolio_val = self.cash + (self._quantities * prices).sum()
+        self._append(timestamp, portfolio_val, self.get_realised_pnl(), unrealised)
+
+    def _append(self, timestamp, portfolio_val, realised, unrealised):
+        if self._size == len(self._cash):
+            self._resize(len(self._cash) * 2)
+        i = self._size
+        self._timestamps[i] = timestamp
+        self._portfolio_values[i] = portfolio_val
+        self._realised[i] = realised
+        self._unrealised[i] = unrealised
+        self._cash[i] = self.cash
+        self._size += 1
+        self._frame = None
+        self._update_stats(portfolio_val, realised)
+
+    def _update_stats(self, portfolio_val, realised):
+        # Returns, first one is 0 to match pct_change().fillna(0)
+        if self._stat_count == 0:
+            ret = 0.0
+            self._peak = portfolio_val
+        else:
+            prev = self._prev_value
+            ret = portfolio_val / prev - 1 if prev != 0 else 0.0
+
+            change = realised - self._prev_realised
+            if change > 0:
+                self._gains += change
+                self._wins += 1
+            elif change < 0:
+                self._losses -= change
+                self._loss_count += 1
+
+        # Welford running mean/variance of returns
+        self._stat_count += 1
+        delta = ret - self._ret_mean
+        self._ret_mean += delta / self._stat_count
+        self._ret_m2 += delta * (ret - self._ret_mean)
+
+        if portfolio_val > self._peak:
+            self._peak = portfolio_val
+        if self._peak != 0:
+            drawdown = (portfolio_val - self._peak) / self._peak
+            if drawdown < self._max_drawdown:
+                self._max_drawdown = drawdown
+
+        self._prev_value = portfolio_val
+        self._prev_realised = realised
 
     def sharpe_ratio(self, timeframe):
-        df = self.get_pnl_dataframe()
-        if df.empty or len(df) < 2:
+        if self._stat_count < 2:
             return 0.0
 
-        df['returns'] = df['portfolio_value'].pct_change().fillna(0)
-        mean = df['returns'].mean()
-        std = df['returns'].std()
+        std = (self._ret_m2 / (self._stat_count - 1)) ** 0.5
         if std == 0:
             return 0.0
-        # Assuming 252 trading days
-        periods_per_year = 252  # default daily
-        if timeframe.endswith('Min'):
-            minutes = int(timeframe[:-3])
-            periods_per_day = 6.5 * 60 / minutes  # 6.5 hours trading day
-            periods_per_year = 252 * periods_per_day
-        elif timeframe.endswith('H'):
-            hours = int(timeframe[:-1])
-            periods_per_day = 6.5 / hours
-            periods_per_year = 252 * periods_per_day
-        elif timeframe.endswith('D'):
-            days = int(timeframe[:-1])
-            periods_per_year = 252 / days
-
-        return (mean / std) * (periods_per_year ** 0.5)
+        return (self._ret_mean / std) * (periods_per_year(timeframe) ** 0.5)
 
     def max_drawdown(self):
-        df = self.get_pnl_dataframe()
-        if df.empty:
-            return 0.0
-        cum_max = df['portfolio_value'].cummax()
-        dd = (df['portfolio_value'] - cum_max) / cum_max
-        return dd.min()
+        return self._max_drawdown
 
     def profit_factor(self):
-        realised_changes = np.diff([h['realised_pnl'] for h in self.pnl_history])
-        gains = sum(x for x in realised_changes if x > 0)
-        losses = -sum(x for x in realised_changes if x < 0)
-        if losses == 0:
-            return float('inf') if gains > 0 else 0.0
-        return gains / losses
+        if self._losses == 0:
+            return float('inf') if self._gains > 0 else 0.0
+        return self._gains / self._losses
 
     def win_rate(self):
-        realised_changes = np.diff([h['realised_pnl'] for h in self.pnl_history])
-        wins = sum(1 for x in realised_changes if x > 0)
-        total = sum(1 for x in realised_changes if x != 0)
-        return wins / total if total > 0 else 0.0 
+        total = self._wins + self._loss_count
+        return self._wins / total if total > 0 else 0.0
+
+    def summary(self, market_prices, timeframe, trades_executed):
+        portfolio_val = self.portfolio_value(market_prices)
+        return {
+            "Final Cash": round(self.cash, 2),
+            "Portfolio Value": round(portfolio_val, 2),
+            "Realised PnL": round(self.get_realised_pnl(), 2),
+            "Unrealised PnL": round(self.get_unrealised_pnl(market_prices), 2),
+            "Total Return %": round(((portfolio_val / self.starting_balance) - 1) * 100, 2),
+            "Trades Executed": trades_executed,
+            "Win Rate %": round(self.win_rate() * 100, 2),
+            "Sharpe Ratio": round(self.sharpe_ratio(timeframe), 2),
+            "Max Drawdown %": round(self.max_drawdown() * 100, 2),
+            "Profit Factor": round(self.profit_factor(), 2)
+        }
+
+    def __len__(self):
+        return self._size
+
+    def equity_since(self, start=0):
+        '''(timestamps, portfolio values) recorded from row start on, without building the frame.'''
+        n = self._size
+        return self._timestamps[start:n].copy(), self._portfolio_values[start:n].copy()
 
     def get_pnl_dataframe(self):
-        return pd.DataFrame(self.pnl_history)
\ No newline at end of file
+        if self._frame is not None:
+            return self._frame
+
+        n = self._size
+        if n == 0:
+            self._frame = pd.DataFrame()
+            return self._frame
+
+        # Each row points at the snapshot in force when it was recorded
+        snapshots = np.empty(len(self._position_snapshots), dtype=object)
+        snapshots[:] = self._position_snapshots
+        which = np.searchsorted(self._position_rows, np.arange(n), side='right') - 1
+
+        self._frame = pd.DataFrame({
+            'timestamp': self._timestamps[:n].copy(),
+            'portfolio_value': self._portfolio_values[:n].copy(),
+            'realised_pnl': self._realised[:n].copy(),
+            'unrealised_pnl': self._unrealised[:n].copy(),
+            'cash': self._cash[:n].copy(),
+            'positions': snapshots[which]
+        })
+        return self._frame
\ No newline at end of file
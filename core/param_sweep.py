@@ -0,0 +1,84 @@
+import os
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from core.backtester import BackTester
+from core.backtest_pool import SharedBars, attach_shared_bars, POOL_CONTEXT
+from core.strategy_loader import discover_strategies
+from data.history import DataFetcher
+
+METRICS = {
+    'sharpe': 'Sharpe Ratio',
+    'return': 'Total Return %',
+    'drawdown': 'Max Drawdown %',
+}
+
+# Shared bar blocks already mapped by this worker process, {shm name: (shm, arrays)}
+_attached = {}
+
+def expand_grid(param_grid):
+    '''{'short_window': [5, 10], 'long_window': [20, 50]} -> list of keyword dicts, one per combination.'''
+    keys = list(param_grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(param_grid[k] for k in keys))]
+
+
+def _sweep_worker(bars_spec, strategy_name, params, symbol, timeframe, starting_balance):
+    # Map the bars once per worker, every task after the first reuses them
+    if bars_spec['name'] not in _attached:
+        shm, *arrays = attach_shared_bars(bars_spec)
+        _attached[bars_spec['name']] = (shm, arrays)
+    _, arrays = _attached[bars_spec['name']]
+
+    strategy = discover_strategies()[strategy_name](**params)
+    backtester = BackTester(strategy=strategy, starting_balance=starting_balance)
+    return backtester.simulate(symbol, timeframe, *arrays)
+
+
+def iter_sweep(strategy_name, param_grid, symbol, timeframe, start, end, starting_balance=100000, max_workers=None):
+    '''
+    Backtest every combination in param_grid over one fetch of the bars.
+    Yields (params, summary) in completion order; combinations that fail are reported and skipped.
+    '''
+    if strategy_name not in discover_strategies():
+        raise ValueError(f'Unknown strategy: {strategy_name}')
+    data = DataFetcher().fetch(symbol, timeframe, start, end)
+    if data.empty:
+        raise ValueError(f"No data returned for {symbol} from {start} to {end}")
+
+    combinations = expand_grid(param_grid)
+    max_workers = max_workers or os.cpu_count() or 1
+    with SharedBars(data) as bars:
+        pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=POOL_CONTEXT)
+        try:
+            futures = {
+                pool.submit(_sweep_worker, bars.spec(), strategy_name, params, symbol, timeframe, starting_balance): params
+                for params in combinations
+            }
+            for future in as_completed(futures):
+                params = futures[future]
+                try:
+                    yield params, future.result()
+                except Exception as e:
+                    print(f'[Sweep] {strategy_name} {params} failed: {e}')
+        finally:
+            # Also reached when the caller stops iterating early
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def sweep(strategy_name, param_grid, symbol, timeframe, start, end, starting_balance=100000,
+          metric='sharpe', max_workers=None, on_result=None):
+    '''
+    Run iter_sweep to completion and rank the results by a summary metric, best first.
+    metric is 'sharpe', 'return', 'drawdown' or any summary key. on_result(params, summary)
+    is called as each combination finishes.
+    '''
+    key = METRICS.get(metric, metric)
+    results = []
+    for params, summary in iter_sweep(strategy_name, param_grid, symbol, timeframe, start, end,
+                                      starting_balance=starting_balance, max_workers=max_workers):
+        if on_result:
+            on_result(params, summary)
+        results.append((params, summary))
+
+    # Drawdown is stored as a negative percent, so higher is better for every metric
+    results.sort(key=lambda r: r[1][key], reverse=True)
+    return results
@@ -0,0 +1,67 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+RESULT_CACHE_MB = float(os.getenv('RESULT_CACHE_MB', 512))
+
+def result_id(params):
+    '''Stable ID of a backtest run, the same for the same parameters.'''
+    return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def result_size(value):
+    '''Approximate bytes held by the DataFrames in a (nested) result.'''
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sum(result_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(result_size(v) for v in value)
+    return 0
+
+
+class ResultCache:
+    '''
+    Backtest results kept in the server process, keyed by result ID, so the browser
+    only has to hold the ID. Least recently used results are evicted once their
+    DataFrames take more than max_mb. Dash runs callbacks on several threads,
+    so every access takes a lock.
+    '''
+    def __init__(self, max_mb=RESULT_CACHE_MB):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.nbytes = 0
+        self._entries = OrderedDict() # {result_id: (value, size)}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        size = result_size(value)
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                print(f'[ResultCache] Result {key} ({size / 1e6:.1f} MB) is larger than the cache, not kept')
+                return
+            while self._entries and self.nbytes + size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+            self._entries[key] = (value, size)
+            self.nbytes += size
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
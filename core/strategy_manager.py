@@ -1,21 +1,55 @@
-import asyncio
 from core.strategy_runner import StrategyRunner
+from core.market_data_hub import MarketDataHub
+import re
+import threading
+from pathlib import Path
+from data.live import LiveFeeder
+from core.trade_table import TradeTable
 
 class LiveStrategyManager:
-    def __init__(self):
+    def __init__(self, hub=None, feed=None, checkpoint_dir=None, record_latency=False):
         self.runners = []
+        self._hub = hub
+        self.record_latency = record_latency
+        # When set, each runner checkpoints under checkpoint_dir/<strategy>_<symbol>_<timeframe>
+        self.checkpoint_dir = Path(checkpoint_dir) if checkpoint_dir else None
+        # One bar tree per symbol serves every runner's timeframe
+        self.feed = feed or LiveFeeder()
+        self._trade_table = None
+        self._trade_table_seen = {} # {name: (id of its broker, trades already in the table)}
+        self._trade_table_lock = threading.Lock()
 
-    def add_strategy(self, strategy, strategy_name, symbol, timeframe, starting_balance=100000):
-        runner = StrategyRunner(strategy, symbol, timeframe, starting_balance=starting_balance)
+    @property
+    def hub(self):
+        # One stream connection shared by every runner, opened on first use
+        if self._hub is None:
+            self._hub = MarketDataHub()
+        return self._hub
+
+    def add_strategy(self, strategy, strategy_name, symbol, timeframe, starting_balance=100000, **runner_options):
+        if self.checkpoint_dir is not None:
+            key = re.sub(r'[^A-Za-z0-9]+', '_', f'{strategy_name}_{symbol}_{timeframe}')
+            runner_options.setdefault('checkpoint_dir', self.checkpoint_dir / key)
+        runner_options.setdefault('record_latency', self.record_latency)
+        runner = StrategyRunner(strategy, symbol, timeframe, starting_balance=starting_balance,
+                                hub=self.hub, feed=self.feed, **runner_options)
         self.runners.append({'name': strategy_name, 'runner': runner, 'running': True})
+        return runner
 
     def remove_strategy(self, name):
+        for r in self.runners:
+            if r['name'] == name:
+                r['runner'].close(discard=True)
         self.runners = [r for r in self.runners if r['name'] != name]
 
     def toggle_strategy(self, name, state):
         for r in self.runners:
             if r['name'] == name:
                 r['running'] = state
+                if state:
+                    r['runner'].subscribe()
+                else:
+                    r['runner'].unsubscribe()
     
     def get_all_results(self):
         results = {}
@@ -24,25 +58,65 @@ class LiveStrategyManager:
             results[r['name']] = {
                 'pnl_history': pnl,
                 'trade_history': trades,
-                'summary': summary
+                'summary': summary,
+                'latency': r['runner'].get_latency()
             }
         return results
 
+    def get_all_summaries(self):
+        '''{name: {'summary', 'latency'}}, get_all_results() without the histories, cheap enough to poll.'''
+        return {r['name']: {'summary': r['runner'].get_summary(), 'latency': r['runner'].get_latency()}
+                for r in self.runners}
+
+    def get_equity(self, name, start=0):
+        '''(timestamps, portfolio values) of a runner's equity curve from row start on, empty if it isn't running.'''
+        for r in self.runners:
+            if r['name'] == name:
+                return r['runner'].get_equity(start)
+        return [], []
+
+    def get_trade_table(self, names):
+        '''
+        TradeTable of the named runners' trades. Only the fills since the last call are
+        appended; it is rebuilt when the names change or a runner's broker is replaced.
+        '''
+        runners = [r for r in self.runners if r['name'] in names]
+        with self._trade_table_lock:
+            seen = self._trade_table_seen
+            if (self._trade_table is None or set(seen) != {r['name'] for r in runners}
+                    or any(seen[r['name']][0] != id(r['runner'].broker)
+                           or seen[r['name']][1] > len(r['runner'].broker.trade_log) for r in runners)):
+                self._trade_table = TradeTable()
+                seen = self._trade_table_seen = {r['name']: (id(r['runner'].broker), 0) for r in runners}
+            for r in runners:
+                trade_log = r['runner'].broker.trade_log
+                broker_id, start = seen[r['name']]
+                if len(trade_log) > start:
+                    self._trade_table.append(r['name'], trade_log.columns_since(start))
+                    seen[r['name']] = (broker_id, len(trade_log))
+            return self._trade_table
+
     async def run_all(self):
-        active_runners = [r['runner'].run() for r in self.runners if r['running']]
+        active_runners = [r['runner'] for r in self.runners if r['running']]
         if active_runners:
+            for runner in active_runners:
+                runner.subscribe()
             try:
-                await asyncio.gather(*active_runners)
+                await self.hub.run()
             except Exception as e:
                 print('Exception in run_all', e)
 
-    def clear_all(self):
+    def clear_all(self, discard=False):
+        '''Close every runner. discard=True also deletes their checkpoints.'''
+        for r in self.runners:
+            r['runner'].close(discard=discard)
         self.runners = []
+        self.feed.clear()
 
     def stop_current(self):
         if self.runners:
             try:
-                self.runners[0]['runner'].stop()
+                self.hub.stop()
             except Exception as e:
-                print('Exception stopping current runner', e)
-        self.clear_all()
\ No newline at end of file
+                print('Exception stopping stream', e)
+        self.clear_all(discard=True)
\ No newline at end of file
@@ -1,33 +1,98 @@
 from core.live_sim import LiveSimulator
+from core.market_data_hub import MarketDataHub
+from core.checkpoint import Checkpointer
 from data.live import LiveFeeder
+import pickle
 import pandas as pd
-import asyncio
 
 class StrategyRunner:
-    def __init__(self, strategy, symbol, timeframe, starting_balance=100000):
+    def __init__(self, strategy, symbol, timeframe, starting_balance=100000, evaluate_on='trade', throttle_ms=250,
+                 executor=None, deadline_ms=None, hub=None, feed=None, checkpoint_dir=None, record_latency=False):
         self.strategy = strategy
         self.symbol = symbol
         self.timeframe = timeframe
-        self.feed = LiveFeeder(timeframe=self.timeframe)
-        self.live_sim = LiveSimulator(self.feed, self.strategy, starting_balance=starting_balance)
+        # Runners started by LiveStrategyManager share its hub and feed, a lone runner gets its own
+        self.hub = hub or MarketDataHub()
+        self.feed = feed or LiveFeeder()
+        self.live_sim = LiveSimulator(self.feed, self.strategy, timeframe=self.timeframe, starting_balance=starting_balance,
+                                      evaluate_on=evaluate_on, throttle_ms=throttle_ms,
+                                      executor=executor, deadline_ms=deadline_ms, record_latency=record_latency)
         self.broker = self.live_sim.get_broker()
         self.metrics = self.broker.get_metrics()
         self.starting_balance = starting_balance
+        self.checkpoint = None
+        if checkpoint_dir is not None:
+            # A process worker evaluates its own copy of the strategy, so the snapshots would miss its state
+            if self.live_sim.executor == 'process':
+                raise ValueError(f"{strategy.name} runs in a 'process' executor, which cannot be checkpointed. "
+                                 "Use 'thread' or 'inline'.")
+            self.checkpoint = Checkpointer(checkpoint_dir)
+            self.restore()
+            self.broker.on_fill = self.checkpoint.record_fill
+            self.live_sim.checkpoint = self.checkpoint
+
+    def restore(self):
+        '''
+        Pick up from the last checkpoint: the snapshotted strategy, broker state with its history
+        and bar window, then the bar closes and fills journalled after it, replayed in order.
+        '''
+        snapshot, histories, records = self.checkpoint.load()
+        level = self.feed.level(self.symbol, self.timeframe)
+        if snapshot is not None:
+            self.strategy = self.live_sim.strategy = pickle.loads(snapshot['strategy'])
+            self.broker.restore(snapshot['broker'], histories)
+            # Another runner on the same bars may have restored a newer window already
+            if snapshot['ring'].count > level.ring.count:
+                level.ring = snapshot['ring']
+
+        for record in records:
+            ts = pd.Timestamp(record['timestamp'])
+            if record['type'] == 'bar':
+                level.ring.upsert(ts, record['open'], record['high'], record['low'], record['close'], record['volume'])
+                self.metrics.record(ts, {self.symbol: record['close']})
+            elif record['side'] == 'BUY':
+                self.broker.buy(record['symbol'], record['price'], quantity=record['quantity'], timestamp=ts)
+            else:
+                self.broker.sell(record['symbol'], record['price'], quantity=record['quantity'], timestamp=ts)
+
+        if level.ring.count and self.symbol not in self.feed.last_prices:
+            self.feed.last_prices[self.symbol] = level.ring.last_close()
+
+    def subscribe(self):
+        self.feed.subscribe(self.symbol, self.timeframe, on_bar=self.live_sim.handle_bar, on_trade=self.live_sim.handle_trade)
+        self.hub.subscribe(self.symbol, on_bar=self.feed.handle_bar, on_trade=self.feed.handle_trade)
+
+    def unsubscribe(self):
+        self.feed.unsubscribe(self.symbol, self.timeframe, on_bar=self.live_sim.handle_bar, on_trade=self.live_sim.handle_trade)
+        if not self.feed.has_listeners(self.symbol):
+            self.hub.unsubscribe(self.symbol, on_bar=self.feed.handle_bar, on_trade=self.feed.handle_trade)
+
+    def close(self, discard=False):
+        self.unsubscribe()
+        self.live_sim.close()
+        if self.checkpoint is not None:
+            self.checkpoint.close(discard=discard)
 
     async def run(self):
-        self.live_sim.stream.subscribe_bars(self.live_sim.handle_bar, self.symbol)
-        self.live_sim.stream.subscribe_trades(self.live_sim.handle_trade, self.symbol)
-        await self.live_sim.stream._run_forever()
+        self.subscribe()
+        await self.hub.run()
 
     def stop(self):
-        try:
-            stop_fn = getattr(self.live_sim.stream, 'stop', None)
-            if callable(stop_fn):
-                result = stop_fn()
-                if asyncio.iscoroutine(result):
-                    asyncio.create_task(result)
-        except Exception as e:
-            print('Error stopping stream:', e)
+        self.close()
+        self.hub.stop()
+
+    def get_equity(self, start=0):
+        return self.metrics.equity_since(start)
+
+    def get_latency(self):
+        return self.live_sim.latency_summary()
+
+    def get_summary(self):
+        '''The summary of get_results() without copying the pnl and trade histories.'''
+        if not len(self.metrics) or self.symbol not in self.feed.last_prices:
+            return {}
+        final_price = self.feed.get_last_price(self.symbol)
+        return self.metrics.summary({self.symbol: final_price}, self.timeframe, len(self.broker.trade_log))
 
     def get_results(self):
         pnl_history = self.metrics.get_pnl_dataframe().copy()
@@ -43,16 +108,5 @@ class StrategyRunner:
             trade_history['timestamp'] = trade_history['timestamp'].apply(lambda x: x[1])
 
         final_price = self.feed.get_last_price(self.symbol)
-        summary = {
-            "Final Cash": round(self.metrics.cash, 2),
-            "Portfolio Value": round(self.metrics.portfolio_value({self.symbol: final_price}), 2),
-            "Realised PnL": round(self.metrics.get_realised_pnl(), 2),
-            "Unrealised PnL": round(self.metrics.get_unrealised_pnl({self.symbol: final_price}), 2),
-            "Total Return %": round(((self.metrics.portfolio_value({self.symbol: final_price}) / self.starting_balance) - 1) * 100, 2),
-            "Trades Executed": len(self.broker.trade_history),
-            "Win Rate %": round(self.metrics.win_rate() * 100, 2),
-            "Sharpe Ratio": round(self.metrics.sharpe_ratio(self.timeframe), 2),
-            "Max Drawdown %": round(self.metrics.max_drawdown() * 100, 2),
-            "Profit Factor": round(self.metrics.profit_factor(), 2)
-        }
+        summary = self.metrics.summary({self.symbol: final_price}, self.timeframe, len(self.broker.trade_log))
         return pnl_history, trade_history, summary
\ No newline at end of file
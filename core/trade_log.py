@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+SIDES = np.array(['BUY', 'SELL'], dtype=object)
+SIDE_CODES = {'BUY': 0, 'SELL': 1}
+
+class TradeLog:
+    '''
+    Append-only trade journal kept as typed column buffers.
+    Buffers double in size when full and the DataFrame is only built when asked for.
+    '''
+    def __init__(self, capacity=256):
+        self._size = 0
+        self._timestamps = np.empty(capacity, dtype=object)
+        self._symbols = np.empty(capacity, dtype=object)
+        self._sides = np.empty(capacity, dtype=np.int8)
+        self._prices = np.empty(capacity, dtype=float)
+        self._quantities = np.empty(capacity, dtype=float)
+        self._frame = None
+
+    def __getstate__(self):
+        # The cached frame is rebuilt on demand, no need to pickle it
+        state = self.__dict__.copy()
+        state['_frame'] = None
+        return state
+
+    def _grow(self):
+        capacity = max(1, len(self._prices) * 2)
+        for name in ('_timestamps', '_symbols', '_sides', '_prices', '_quantities'):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def append(self, timestamp, symbol, side, price, quantity):
+        if self._size == len(self._prices):
+            self._grow()
+        i = self._size
+        self._timestamps[i] = timestamp
+        self._symbols[i] = symbol
+        self._sides[i] = SIDE_CODES[side]
+        self._prices[i] = price
+        self._quantities[i] = quantity
+        self._size += 1
+        self._frame = None
+
+    def __len__(self):
+        return self._size
+
+    def extend(self, columns):
+        '''Append the trades in a columns_since() dict.'''
+        count = len(columns['price'])
+        while self._size + count > len(self._prices):
+            self._grow()
+        start, end = self._size, self._size + count
+        self._timestamps[start:end] = columns['timestamp']
+        self._symbols[start:end] = columns['symbol']
+        self._sides[start:end] = [SIDE_CODES[side] for side in columns['side']]
+        self._prices[start:end] = columns['price']
+        self._quantities[start:end] = columns['quantity']
+        self._size = end
+        self._frame = None
+
+    def columns_since(self, start=0):
+        '''{column: array} of the trades from row start on, without building the frame.'''
+        n = self._size
+        return {
+            'timestamp': self._timestamps[start:n].copy(),
+            'symbol': self._symbols[start:n].copy(),
+            'side': SIDES[self._sides[start:n]],
+            'price': self._prices[start:n].copy(),
+            'quantity': self._quantities[start:n].copy()
+        }
+
+    def to_dataframe(self):
+        if self._frame is not None:
+            return self._frame
+
+        n = self._size
+        if n == 0:
+            self._frame = pd.DataFrame({
+                'timestamp': pd.Series(dtype='datetime64[ns]'),
+                'symbol': pd.Series(dtype='str'),
+                'side': pd.Series(dtype='str'),
+                'price': pd.Series(dtype='float'),
+                'quantity': pd.Series(dtype='float')
+            })
+        else:
+            self._frame = pd.DataFrame({
+                'timestamp': self._timestamps[:n].copy(),
+                'symbol': self._symbols[:n].copy(),
+                'side': SIDES[self._sides[:n]],
+                'price': self._prices[:n].copy(),
+                'quantity': self._quantities[:n].copy()
+            })
+        return self._frame
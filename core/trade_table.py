@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+PAGE_SIZE = 50
+COLUMNS = ['strategy', 'timestamp', 'symbol', 'side', 'price', 'quantity']
+
+def _reserve(array, size):
+    '''array, or a copy of it with at least twice the room once size rows no longer fit.'''
+    if size <= len(array):
+        return array
+    grown = np.empty(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class TradeTable:
+    '''
+    The trades of several strategies as columnar buffers, for paging through them.
+    Rows stay in the order they were appended, with an index of each strategy's rows.
+    Buffers double in size when full, so appending a fill only writes the new rows.
+    The ascending order of a (strategy, column) is sorted once and trades appended later
+    are merged into it with searchsorted, rewriting only the part of the order after the
+    first insertion, which is nothing when they sort last, as new fills do by timestamp.
+    '''
+    def __init__(self, trade_histories=None):
+        self.columns = None # {column: buffer}, the first length rows are in use
+        self.length = 0
+        self.index = {} # {strategy: buffer of its rows}
+        self._counts = {} # {strategy: rows in use in its index buffer}
+        self._orders = {} # {(strategy, column): (buffer of rows in ascending order, buffer of their values)}
+        self.tz = None # timestamps are kept as naive UTC datetime64 and shown in this timezone
+        for strategy, trades in (trade_histories or {}).items():
+            self.append(strategy, trades)
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values()) if self.columns else 0
+
+    def append(self, strategy, trades):
+        '''Add strategy's trades, a DataFrame or {column: array} with the trade log's columns.'''
+        if trades is None or not len(trades['price']):
+            return
+        count = len(trades['price'])
+        added = {'strategy': np.full(count, strategy, dtype=object)}
+        for column in COLUMNS[1:]:
+            added[column] = np.asarray(trades[column]) if column != 'timestamp' else self._utc(trades[column])
+        start, end = self.length, self.length + count
+        rows = np.arange(start, end)
+
+        if self.columns is None:
+            self.columns = {column: np.empty(0, dtype=added[column].dtype) for column in COLUMNS}
+        for column in COLUMNS:
+            buffer = self.columns[column] = _reserve(self.columns[column], end)
+            buffer[start:end] = added[column]
+        self.length = end
+
+        index = self.index.get(strategy, np.empty(0, dtype=np.int64))
+        used = self._counts.get(strategy, 0)
+        index = self.index[strategy] = _reserve(index, used + count)
+        index[used:used + count] = rows
+        self._counts[strategy] = used + count
+
+        for key in list(self._orders):
+            order_strategy, column = key
+            if order_strategy is not None and order_strategy != strategy:
+                continue
+            # The cached order held every row of order_strategy before this append
+            used = self.count(order_strategy) - count
+            order, values = self._orders[key]
+            order, values = _reserve(order, used + count), _reserve(values, used + count)
+            added_order = np.argsort(added[column], kind='stable')
+            added_values = added[column][added_order]
+            # side='right' keeps the new rows after equal older ones, as a stable sort would
+            positions = np.searchsorted(values[:used], added_values, side='right')
+            first = positions[0]
+            order[first:used + count] = np.insert(order[first:used], positions - first, rows[added_order])
+            values[first:used + count] = np.insert(values[first:used], positions - first, added_values)
+            self._orders[key] = (order, values)
+
+    def _utc(self, timestamps):
+        timestamps = pd.DatetimeIndex(timestamps)
+        if timestamps.tz is not None:
+            self.tz = self.tz or timestamps.tz
+            timestamps = timestamps.tz_convert('UTC').tz_localize(None)
+        return timestamps.to_numpy()
+
+    def rows(self, strategy=None):
+        '''Row positions of strategy's trades, every trade when strategy is None.'''
+        if strategy is None:
+            return np.arange(self.length)
+        if strategy not in self.index:
+            return np.arange(0)
+        return self.index[strategy][:self._counts[strategy]]
+
+    def count(self, strategy=None):
+        return self._counts.get(strategy, 0) if strategy is not None else self.length
+
+    def order(self, strategy=None, sort='timestamp'):
+        '''Rows of strategy in ascending sort order.'''
+        key = (strategy, sort)
+        if self.columns is None:
+            return np.arange(0)
+        if key not in self._orders:
+            rows = self.rows(strategy)
+            values = self.columns[sort][rows]
+            order = np.argsort(values, kind='stable')
+            self._orders[key] = (rows[order], values[order])
+        return self._orders[key][0][:self.count(strategy)]
+
+    def page(self, page=0, page_size=PAGE_SIZE, strategy=None, sort='timestamp', ascending=True):
+        '''The trades on page (from 0) as a DataFrame, with the page clamped to the last one.'''
+        if not self.length:
+            return pd.DataFrame(columns=COLUMNS)
+        pages = self.pages(page_size, strategy)
+        page = min(max(page, 0), pages - 1)
+        order = self.order(strategy, sort)
+        if not ascending:
+            order = order[::-1]
+        rows = order[page * page_size:(page + 1) * page_size]
+        frame = pd.DataFrame({column: self.columns[column][rows] for column in COLUMNS})
+        if self.tz is not None:
+            frame['timestamp'] = frame['timestamp'].dt.tz_localize('UTC').dt.tz_convert(self.tz)
+        return frame
+
+    def pages(self, page_size=PAGE_SIZE, strategy=None):
+        return max(1, -(-self.count(strategy) // page_size))
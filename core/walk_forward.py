@@ -0,0 +1,149 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from core.backtester import BackTester, bar_timestamps
+from core.backtest_pool import SharedBars, attach_shared_bars, POOL_CONTEXT
+from core.param_sweep import METRICS, expand_grid
+from core.strategy_loader import discover_strategies
+from data.history import DataFetcher
+
+def walk_forward_windows(timestamps, train, test, step=None):
+    '''
+    Split sorted bar timestamps into rolling (train_start, train_end, test_end) index
+    ranges. train, test and step are positive durations like '20D'; step defaults to test.
+    Spans with no bars in them (a weekend or holiday) are stepped over.
+    '''
+    timestamps = pd.DatetimeIndex(timestamps)
+    train, test = pd.Timedelta(train), pd.Timedelta(test)
+    step = pd.Timedelta(step) if step else test
+    if min(train, test, step) <= pd.Timedelta(0):
+        raise ValueError(f'train, test and step must be positive durations, got {train}, {test} and {step}')
+
+    windows = []
+    cursor = timestamps[0]
+    while True:
+        train_start = timestamps.searchsorted(cursor)
+        train_end = timestamps.searchsorted(cursor + train)
+        test_end = timestamps.searchsorted(cursor + train + test)
+        if train_end >= len(timestamps):
+            break
+        if train_end > train_start and test_end > train_end:
+            windows.append((train_start, train_end, test_end))
+        cursor += step
+    return windows
+
+
+def _run_window(arrays, window, strategy_name, param_grid, metric, symbol, timeframe, starting_balance):
+    train_start, train_end, test_end = window
+    strategy_class = discover_strategies()[strategy_name]
+    train = [a[train_start:train_end] for a in arrays]
+    test = [a[train_end:test_end] for a in arrays]
+
+    # Pick the in-sample best parameters, or just the defaults when there is no grid
+    best_params, best_summary = {}, None
+    for params in expand_grid(param_grid) if param_grid else [{}]:
+        try:
+            summary = BackTester(strategy_class(**params), starting_balance).simulate(symbol, timeframe, *train)
+        except Exception as e:
+            print(f'[WalkForward] {strategy_name} {params} failed in-sample: {e}')
+            continue
+        if best_summary is None or summary[metric] > best_summary[metric]:
+            best_params, best_summary = params, summary
+
+    if best_summary is None:
+        # Trading the defaults out-of-sample would pass an unoptimised window off as optimised
+        print(f'[WalkForward] {strategy_name} skipped the window from {test[0][0]}: every parameter combination failed in-sample')
+        return {
+            'train_start': train[0][0],
+            'test_start': test[0][0],
+            'test_end': test[0][-1],
+            'skipped': 'every parameter combination failed in-sample',
+        }
+
+    pnl_history, trade_history, summary = BackTester(strategy_class(**best_params), starting_balance).run_arrays(symbol, timeframe, *test)
+    return {
+        'train_start': train[0][0],
+        'test_start': test[0][0],
+        'test_end': test[0][-1],
+        'params': best_params,
+        'in_sample': best_summary,
+        'out_of_sample': summary,
+        'pnl_history': pnl_history,
+        'trade_history': trade_history,
+    }
+
+
+def _window_worker(bars_spec, *args):
+    shm, *arrays = attach_shared_bars(bars_spec)
+    try:
+        return _run_window(arrays, *args)
+    finally:
+        del arrays
+        try:
+            shm.close()
+        except BufferError:
+            pass
+
+
+def stitch_windows(results, starting_balance):
+    '''
+    Chain the out-of-sample equity curves into one. Each window starts from a fresh
+    broker, so its money columns are scaled by the growth of the windows before it.
+    '''
+    pnl_frames, trade_frames = [], []
+    scale, realised_offset = 1.0, 0.0
+    for i, result in enumerate(results):
+        pnl = result['pnl_history'].copy()
+        pnl['portfolio_value'] *= scale
+        pnl['cash'] *= scale
+        pnl['unrealised_pnl'] *= scale
+        pnl['realised_pnl'] = pnl['realised_pnl'] * scale + realised_offset
+        pnl['window'] = i
+        pnl_frames.append(pnl)
+
+        trades = result['trade_history'].copy()
+        trades['window'] = i
+        trade_frames.append(trades)
+
+        realised_offset = pnl['realised_pnl'].iloc[-1]
+        scale = pnl['portfolio_value'].iloc[-1] / starting_balance
+    return pd.concat(pnl_frames, ignore_index=True), pd.concat(trade_frames, ignore_index=True)
+
+
+def run_walk_forward(strategy_name, symbol, timeframe, start, end, train, test, step=None, param_grid=None,
+                     metric='sharpe', starting_balance=100000, max_workers=None):
+    '''
+    Walk-forward backtest over one fetch of the bars. Each window optionally picks the best
+    param_grid combination in-sample, then trades the following test span out-of-sample.
+    Windows run in parallel. Returns (pnl_history, trade_history, window_summaries) where the
+    histories are the stitched out-of-sample results. A window whose in-sample runs all
+    failed is left out of them and its summary says why under 'skipped'.
+    '''
+    if strategy_name not in discover_strategies():
+        raise ValueError(f'Unknown strategy: {strategy_name}')
+    data = DataFetcher().fetch(symbol, timeframe, start, end)
+    if data.empty:
+        raise ValueError(f"No data returned for {symbol} from {start} to {end}")
+
+    windows = walk_forward_windows(bar_timestamps(data.index), train, test, step)
+    if not windows:
+        raise ValueError(f'Not enough data from {start} to {end} for a {train} train / {test} test window')
+
+    key = METRICS.get(metric, metric)
+    max_workers = max_workers or min(len(windows), os.cpu_count() or 1)
+    with SharedBars(data) as bars, ProcessPoolExecutor(max_workers=max_workers, mp_context=POOL_CONTEXT) as pool:
+        futures = [
+            pool.submit(_window_worker, bars.spec(), window, strategy_name, param_grid, key, symbol, timeframe, starting_balance)
+            for window in windows
+        ]
+        results = [future.result() for future in futures]
+
+    traded = [result for result in results if 'skipped' not in result]
+    if not traded:
+        raise ValueError(f'{strategy_name} failed in-sample in every walk-forward window')
+    pnl_history, trade_history = stitch_windows(traded, starting_balance)
+    window_summaries = [
+        {k: v for k, v in result.items() if k not in ('pnl_history', 'trade_history')}
+        for result in results
+    ]
+    return pnl_history, trade_history, window_summaries
@@ -0,0 +1,114 @@
+import os
+import json
+import tempfile
+import threading
+from pathlib import Path
+import pandas as pd
+
+CACHE_DIR = Path(os.getenv('BAR_CACHE_DIR', Path(__file__).resolve().parent.parent / 'cache' / 'bars'))
+
+# One lock per cache file pair, backtest jobs and Dash callbacks store from several threads at once
+_store_locks = {}
+_store_locks_guard = threading.Lock()
+
+def _store_lock(data_path):
+    with _store_locks_guard:
+        return _store_locks.setdefault(data_path, threading.Lock())
+
+
+def _write_atomic(path, write):
+    '''Write path through a uniquely named temp file beside it, so concurrent writers never share one.'''
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f'{path.name}.', suffix='.tmp', delete=False) as f:
+        tmp_path = f.name
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _to_utc(ts):
+    ts = pd.Timestamp(ts)
+    if ts.tzinfo is None:
+        return ts.tz_localize('UTC')
+    return ts.tz_convert('UTC')
+
+class BarCache:
+    '''
+    On-disk store of historical bars, one parquet file per symbol and timeframe.
+    A JSON sidecar lists the [start, end] ranges already fetched so that only
+    the gaps of a new request have to be downloaded.
+    '''
+    def __init__(self, cache_dir=None):
+        self.cache_dir = Path(cache_dir) if cache_dir else CACHE_DIR
+
+    def _paths(self, symbol, timeframe):
+        stem = f'{symbol.upper()}_{timeframe}'
+        return self.cache_dir / f'{stem}.parquet', self.cache_dir / f'{stem}.json'
+
+    def coverage(self, symbol, timeframe):
+        _, meta_path = self._paths(symbol, timeframe)
+        if not meta_path.exists():
+            return []
+        ranges = json.loads(meta_path.read_text())
+        return [(pd.Timestamp(start), pd.Timestamp(end)) for start, end in ranges]
+
+    def missing_ranges(self, symbol, timeframe, start, end):
+        start, end = _to_utc(start), _to_utc(end)
+        gaps = []
+        cursor = start
+        for covered_start, covered_end in self.coverage(symbol, timeframe):
+            if covered_end < cursor:
+                continue
+            if covered_start > end:
+                break
+            if covered_start > cursor:
+                gaps.append((cursor, covered_start))
+            cursor = max(cursor, covered_end)
+        if cursor < end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def load(self, symbol, timeframe, start, end):
+        data_path, _ = self._paths(symbol, timeframe)
+        if not data_path.exists():
+            return pd.DataFrame()
+        start, end = _to_utc(start), _to_utc(end)
+        bars = pd.read_parquet(data_path)
+        timestamps = bars.index.get_level_values('timestamp')
+        return bars[(timestamps >= start) & (timestamps <= end)]
+
+    def store(self, symbol, timeframe, bars, start, end):
+        '''Merge freshly fetched bars for [start, end] into the cached segment.'''
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        data_path, _ = self._paths(symbol, timeframe)
+        # The read-merge-write of both files must not interleave with another store of the same pair
+        with _store_lock(data_path.resolve()):
+            self._store(symbol, timeframe, bars, start, end)
+
+    def _store(self, symbol, timeframe, bars, start, end):
+        data_path, meta_path = self._paths(symbol, timeframe)
+        if not bars.empty:
+            if data_path.exists():
+                bars = pd.concat([pd.read_parquet(data_path), bars])
+                bars = bars[~bars.index.duplicated(keep='last')]
+            bars = bars.sort_index()
+            _write_atomic(data_path, bars.to_parquet)
+
+        # Don't mark the future as covered, those bars don't exist yet
+        start, end = _to_utc(start), min(_to_utc(end), pd.Timestamp.now(tz='UTC'))
+        if start >= end:
+            return
+        ranges = sorted(self.coverage(symbol, timeframe) + [(start, end)])
+        merged = [ranges[0]]
+        for range_start, range_end in ranges[1:]:
+            last_start, last_end = merged[-1]
+            if range_start <= last_end:
+                merged[-1] = (last_start, max(last_end, range_end))
+            else:
+                merged.append((range_start, range_end))
+
+        text = json.dumps([[s.isoformat(), e.isoformat()] for s, e in merged])
+        _write_atomic(meta_path, lambda tmp_path: Path(tmp_path).write_text(text))
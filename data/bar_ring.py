@@ -0,0 +1,115 @@
+import copy
+import numpy as np
+import pandas as pd
+from data.bar_window import BarWindow
+
+class BarRing:
+    '''
+    Fixed-capacity OHLCV buffer for one symbol, oldest bars evicted first.
+    Every bar is written twice (slot and slot + capacity) so the latest n bars
+    are always one contiguous slice, which lets windows be plain array views.
+    A dict from bucket start (ns) to sequence number makes update-or-append O(1).
+    '''
+    def __init__(self, symbol, capacity=500):
+        self.symbol = symbol
+        self.capacity = capacity
+        self.count = 0  # bars ever appended, the newest has sequence count - 1
+        self.timestamps = np.empty(2 * capacity, dtype=object)
+        self.opens = np.empty(2 * capacity, dtype=float)
+        self.highs = np.empty(2 * capacity, dtype=float)
+        self.lows = np.empty(2 * capacity, dtype=float)
+        self.closes = np.empty(2 * capacity, dtype=float)
+        self.volumes = np.empty(2 * capacity, dtype=float)
+        self._keys = np.zeros(capacity, dtype=np.int64)
+        self._index = {}
+        self._windows = {}  # {lookback: BarWindow} handed out by window()
+
+    def __getstate__(self):
+        # Cached windows are views of the arrays, pickling would turn them into copies
+        state = self.__dict__.copy()
+        state['_windows'] = {}
+        return state
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def copy(self):
+        '''A copy sharing no buffers with this ring, e.g. to checkpoint it while bars keep arriving.'''
+        ring = copy.copy(self)
+        for name in ('timestamps', 'opens', 'highs', 'lows', 'closes', 'volumes', '_keys'):
+            setattr(ring, name, getattr(self, name).copy())
+        ring._index = dict(self._index)
+        ring._windows = {}
+        return ring
+
+    def upsert(self, timestamp, open_price, high_price, low_price, close_price, volume):
+        '''Write the bar starting at timestamp, replacing it if that bucket is still held.'''
+        key = timestamp.value
+        seq = self._index.get(key)
+        if seq is None:
+            seq = self.count
+            slot = seq % self.capacity
+            if seq >= self.capacity:
+                del self._index[self._keys[slot]]
+            self._keys[slot] = key
+            self._index[key] = seq
+            self.count += 1
+        slot = seq % self.capacity
+        for i in (slot, slot + self.capacity):
+            self.timestamps[i] = timestamp
+            self.opens[i] = open_price
+            self.highs[i] = high_price
+            self.lows[i] = low_price
+            self.closes[i] = close_price
+            self.volumes[i] = volume
+        return seq
+
+    def merge(self, timestamp, high_price, low_price, volume):
+        '''
+        Fold late trades into the bar starting at timestamp: widen its high and low and add
+        their volume, keeping its open and close. False if that bucket is not held.
+        '''
+        seq = self._index.get(timestamp.value)
+        if seq is None:
+            return False
+        slot = seq % self.capacity
+        for i in (slot, slot + self.capacity):
+            self.highs[i] = max(self.highs[i], high_price)
+            self.lows[i] = min(self.lows[i], low_price)
+            self.volumes[i] += volume
+        return True
+
+    def bounds(self, lookback=None):
+        '''[start, end) of the latest lookback bars in the doubled arrays.'''
+        n = len(self) if lookback is None else min(lookback, len(self))
+        if self.count == 0:
+            return 0, 0
+        end = (self.count - 1) % self.capacity + self.capacity + 1
+        return end - n, end
+
+    def window(self, lookback=None):
+        '''
+        View of the latest lookback bars. The same BarWindow is reused per lookback and
+        only its bounds move, so repeated calls cost O(1) and copy nothing.
+        '''
+        window = self._windows.get(lookback)
+        if window is None:
+            window = self._windows[lookback] = BarWindow(self.timestamps, self.opens, self.highs, self.lows,
+                                                         self.closes, self.volumes)
+        window.start, window.end = self.bounds(lookback)
+        return window
+
+    def last_close(self):
+        return self.closes[(self.count - 1) % self.capacity]
+
+    def to_dataframe(self):
+        start, end = self.bounds()
+        return pd.DataFrame({
+            'timestamp': self.timestamps[start:end],
+            'symbol': self.symbol,
+            'open': self.opens[start:end],
+            'high': self.highs[start:end],
+            'low': self.lows[start:end],
+            'close': self.closes[start:end],
+            'volume': self.volumes[start:end],
+        })
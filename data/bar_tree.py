@@ -0,0 +1,194 @@
+from datetime import time
+import numpy as np
+import pandas as pd
+from data.bar_ring import BarRing
+from data.custom_bars import CustomBar
+
+BASE_TIMEFRAME = pd.Timedelta('1Min')
+DAY_NS = 86400 * 10**9
+
+class BarLevel:
+    '''One timeframe of a BarTree.'''
+    def __init__(self, symbol, timeframe, capacity):
+        self.timeframe = timeframe
+        self.timeframe_ns = timeframe.value
+        self.ring = BarRing(symbol, capacity=capacity)
+        self.source = None  # level whose completed bars build this one, None for the base
+        self.consumers = []
+        self.building = None  # bar aggregated from the source's completed bars
+        self.forming = None  # bar aggregated from trades
+
+
+class BarTree:
+    '''
+    Every subscribed timeframe of one symbol, built from the 1-minute bar stream.
+    Each level aggregates the completed bars of the largest existing level that divides it
+    (1Min -> 5Min -> 15Min -> 1Hour). Buckets are aligned to session_start rather than
+    counted, so a missing minute closes its bucket late instead of shifting every later bar.
+    '''
+    def __init__(self, symbol, max_bars=500, session_start=time(9, 30)):
+        self.symbol = symbol
+        self.max_bars = max_bars
+        self.session_start = session_start
+        self._session_ns = pd.Timedelta(hours=session_start.hour, minutes=session_start.minute).value
+        self.levels = {}  # {Timedelta: BarLevel}
+        self.add_timeframe(BASE_TIMEFRAME)
+
+    def add_timeframe(self, timeframe):
+        timeframe = pd.Timedelta(timeframe)
+        if timeframe in self.levels:
+            return self.levels[timeframe]
+        if timeframe < BASE_TIMEFRAME or timeframe % BASE_TIMEFRAME:
+            raise ValueError(f'Timeframe {timeframe} must be a whole number of minutes')
+
+        level = self.levels[timeframe] = BarLevel(self.symbol, timeframe, self.max_bars)
+        # A level keeps the source it was created with, relinking mid-bucket would double count
+        if timeframe != BASE_TIMEFRAME:
+            level.source = max((l for l in self.levels.values() if l.timeframe < timeframe and not timeframe % l.timeframe),
+                               key=lambda l: l.timeframe)
+            level.source.consumers.append(level)
+        return level
+
+    def bucket_start(self, ts, timeframe):
+        session_open = ts.normalize() + pd.Timedelta(self._session_ns)
+        offset = (ts - session_open) // timeframe
+        return session_open + offset * timeframe
+
+    def bucket_starts(self, timestamps, timeframe):
+        '''Vectorised bucket_start, bucket starts as UTC ns.'''
+        if timestamps.tz is None or str(timestamps.tz) == 'UTC':
+            ns = timestamps.asi8
+            session_open = ns - ns % DAY_NS + self._session_ns
+            return session_open + (ns - session_open) // timeframe.value * timeframe.value
+        # Other zones normalise to local midnight, let pandas do that part
+        session_open = timestamps.normalize() + pd.Timedelta(self._session_ns)
+        return (session_open + (timestamps - session_open) // timeframe * timeframe).asi8
+
+    def window(self, timeframe=BASE_TIMEFRAME, lookback=None):
+        level = self.levels.get(pd.Timedelta(timeframe))
+        if level is None:
+            return None
+        return level.ring.window(lookback)
+
+    def update_bar(self, bar):
+        '''Add a 1-minute bar. Returns [(timeframe, bar)] for every bar it completed, shortest first.'''
+        base = self.levels[BASE_TIMEFRAME]
+        final_bar = CustomBar(
+            symbol=self.symbol,
+            timestamp=self.bucket_start(pd.to_datetime(bar.timestamp), BASE_TIMEFRAME),
+            open_price=bar.open,
+            high_price=bar.high,
+            low_price=bar.low,
+            close_price=bar.close,
+            volume=bar.volume
+        )
+        completed = []
+        self._complete(base, final_bar, completed)
+        return completed
+
+    def _complete(self, level, bar, completed):
+        # Later trades in this bucket keep updating the completed bar, unless trades of a
+        # later bucket already started it (Alpaca's bar arrives after its minute closed)
+        if level.forming is None or level.forming.timestamp <= bar.timestamp:
+            level.forming = bar
+        level.ring.upsert(bar.timestamp, bar.open, bar.high, bar.low, bar.close, bar.volume)
+        completed.append((level.timeframe, bar))
+        for consumer in level.consumers:
+            self._absorb(consumer, bar, level.timeframe, completed)
+
+    def _absorb(self, level, bar, bar_timeframe, completed):
+        bucket_start = self.bucket_start(bar.timestamp, level.timeframe)
+        building = level.building
+        if building is not None and building.timestamp != bucket_start:
+            # The source never delivered the end of that bucket, close it with what it has
+            level.building = None
+            self._complete(level, building, completed)
+            building = None
+
+        if building is None:
+            building = level.building = CustomBar(
+                symbol=self.symbol,
+                timestamp=bucket_start,
+                open_price=bar.open,
+                high_price=bar.high,
+                low_price=bar.low,
+                close_price=bar.close,
+                volume=bar.volume
+            )
+        else:
+            building.high = max(building.high, bar.high)
+            building.low = min(building.low, bar.low)
+            building.close = bar.close
+            building.volume += bar.volume
+
+        if bar.timestamp + bar_timeframe >= bucket_start + level.timeframe:
+            level.building = None
+            self._complete(level, building, completed)
+
+    def update_trade(self, price, size, timestamp):
+        '''
+        Add a trade to the forming bar of every level. A trade older than the forming bar
+        is merged into its already closed bar rather than restarting the bucket.
+        '''
+        ts = pd.to_datetime(timestamp)
+        for level in self.levels.values():
+            bucket_start = self.bucket_start(ts, level.timeframe)
+            agg = level.forming
+            if agg is not None and bucket_start < agg.timestamp:
+                # A late trade of an earlier bucket, dropped if that bar is no longer held
+                level.ring.merge(bucket_start, price, price, size)
+                continue
+            if agg is None or agg.timestamp != bucket_start:
+                agg = level.forming = CustomBar(
+                    symbol=self.symbol,
+                    timestamp=bucket_start,
+                    open_price=price,
+                    high_price=price,
+                    low_price=price,
+                    close_price=price,
+                    volume=size
+                )
+            else:
+                agg.high = max(agg.high, price)
+                agg.low = min(agg.low, price)
+                agg.close = price
+                agg.volume += size
+            level.ring.upsert(agg.timestamp, agg.open, agg.high, agg.low, agg.close, agg.volume)
+
+    def update_trades(self, timestamps, prices, sizes):
+        '''
+        Batched update_trade for trades in arrival order. Each run of consecutive trades in
+        one bucket updates its bar once, so the bars match feeding them one by one.
+        '''
+        tz = timestamps.tz
+        for level in self.levels.values():
+            buckets = self.bucket_starts(timestamps, level.timeframe)
+            starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+            ends = np.r_[starts[1:], len(buckets)] - 1
+            highs = np.maximum.reduceat(prices, starts)
+            lows = np.minimum.reduceat(prices, starts)
+            volumes = np.add.reduceat(sizes, starts)
+
+            for i, start in enumerate(starts):
+                bucket_start = pd.Timestamp(buckets[start], tz='UTC')
+                bucket_start = bucket_start.tz_convert(tz) if tz is not None else bucket_start.tz_localize(None)
+                agg = level.forming
+                if agg is not None and bucket_start < agg.timestamp:
+                    level.ring.merge(bucket_start, highs[i], lows[i], volumes[i])
+                    continue
+                if agg is None or agg.timestamp != bucket_start:
+                    agg = level.forming = CustomBar(
+                        symbol=self.symbol,
+                        timestamp=bucket_start,
+                        open_price=prices[start],
+                        high_price=highs[i],
+                        low_price=lows[i],
+                        close_price=prices[ends[i]],
+                        volume=volumes[i]
+                    )
+                else:
+                    agg.high = max(agg.high, highs[i])
+                    agg.low = min(agg.low, lows[i])
+                    agg.close = prices[ends[i]]
+                    agg.volume += volumes[i]
+                level.ring.upsert(agg.timestamp, agg.open, agg.high, agg.low, agg.close, agg.volume)
@@ -0,0 +1,95 @@
+import numpy as np
+
+COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+class BarWindow:
+    '''
+    Read-only view over the last max_lookback bars of a set of OHLCV arrays.
+    window.close etc. are slices of the backing arrays, so nothing is copied per bar.
+    Indexing and iterating still yield per-bar dicts so strategies written
+    against a list of bar dicts (data[-1]['close']) keep working.
+    '''
+    def __init__(self, timestamps, opens, highs, lows, closes, volumes, max_lookback=None, start=0, end=0):
+        self._columns = {}
+        for key, values in zip(COLUMNS, (timestamps, opens, highs, lows, closes, volumes)):
+            values = np.asarray(values).view()
+            values.flags.writeable = False
+            self._columns[key] = values
+        self.max_lookback = max_lookback
+        self.start = start
+        self.end = end
+
+    def advance(self, i):
+        '''Move the window so that bar i is the most recent bar.'''
+        self.end = i + 1
+        if self.max_lookback:
+            self.start = max(0, self.end - self.max_lookback)
+
+    def column(self, key):
+        return self._columns[key][self.start:self.end]
+
+    def copy(self):
+        '''A window over its own copy of the current bars, safe to hand to another thread or process.'''
+        return BarWindow(*(self.column(key).copy() for key in COLUMNS), start=0, end=len(self))
+
+    @property
+    def timestamp(self):
+        return self._columns['timestamp'][self.start:self.end]
+
+    @property
+    def open(self):
+        return self._columns['open'][self.start:self.end]
+
+    @property
+    def high(self):
+        return self._columns['high'][self.start:self.end]
+
+    @property
+    def low(self):
+        return self._columns['low'][self.start:self.end]
+
+    @property
+    def close(self):
+        return self._columns['close'][self.start:self.end]
+
+    @property
+    def volume(self):
+        return self._columns['volume'][self.start:self.end]
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, end, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError('BarWindow slices do not support a step')
+            window = BarWindow.__new__(BarWindow)
+            window._columns = self._columns
+            window.max_lookback = None
+            window.start = self.start + start
+            window.end = self.start + max(start, end)
+            return window
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('BarWindow index out of range')
+        i = self.start + index
+        return {key: values[i] for key, values in self._columns.items()}
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self):
+        return f'<BarWindow {len(self)} bars [{self.start}:{self.end}]>'
+
+
+def get_column(data, key):
+    '''Return one column of a BarWindow or a list of bar dicts as a NumPy array.'''
+    if isinstance(data, BarWindow):
+        return data.column(key)
+    if key == 'timestamp':
+        return np.array([d[key] for d in data], dtype=object)
+    return np.fromiter((d[key] for d in data), dtype=float)
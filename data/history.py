@@ -1,25 +1,56 @@
 import os
 import re
+import pandas as pd
 from dotenv import load_dotenv
 from datetime import datetime
 from alpaca.data.historical import StockHistoricalDataClient
 from alpaca.data.requests import StockBarsRequest
 from alpaca.data.timeframe import TimeFrame
 from alpaca.data.timeframe import TimeFrameUnit
+from data.bar_cache import BarCache
 
 load_dotenv()
 
 class DataFetcher:
-    def __init__(self):
+    def __init__(self, cache=None, use_cache=True):
         self.api_key = os.getenv('APCA_API_KEY_ID')
         self.secret_key = os.getenv('APCA_API_SECRET_KEY')
-        self.historical = StockHistoricalDataClient(self.api_key, self.secret_key)
+        self._historical = None
+        self.cache = (cache or BarCache()) if use_cache else None
+
+    @property
+    def historical(self):
+        # Created on first use so fully cached fetches never need credentials
+        if self._historical is None:
+            self._historical = StockHistoricalDataClient(self.api_key, self.secret_key)
+        return self._historical
 
     def fetch(self, symbol, timeframe, start_date, end_date):
         start_date = datetime.fromisoformat(start_date)
         end_date = datetime.fromisoformat(end_date)
         tf = self.parse_timeframe(timeframe)
 
+        if self.cache is None:
+            return self._download(symbol, tf, start_date, end_date)
+
+        for gap_start, gap_end in self.cache.missing_ranges(symbol, tf.value, start_date, end_date):
+            bars = self._download(symbol, tf, gap_start.to_pydatetime(), gap_end.to_pydatetime())
+            self.cache.store(symbol, tf.value, bars, gap_start, gap_end)
+        return self.cache.load(symbol, tf.value, start_date, end_date)
+
+    def fetch_many(self, symbols, timeframe, start_date, end_date):
+        '''Bars for several symbols in one (symbol, timestamp) indexed frame.'''
+        if self.cache is None:
+            tf = self.parse_timeframe(timeframe)
+            return self._download(list(symbols), tf, datetime.fromisoformat(start_date), datetime.fromisoformat(end_date))
+
+        frames = [self.fetch(symbol, timeframe, start_date, end_date) for symbol in symbols]
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames).sort_index()
+
+    def _download(self, symbol, tf, start_date, end_date):
         request_params = StockBarsRequest(
             symbol_or_symbols=symbol,
             timeframe=tf,
@@ -1,118 +1,166 @@
+import os
+import asyncio
 from datetime import time
+from time import perf_counter_ns
+import numpy as np
 import pandas as pd
-from data.custom_bars import CustomBar
+from data.bar_tree import BarTree, BASE_TIMEFRAME
+
+COLUMNS = ['timestamp', 'symbol', 'open', 'high', 'low', 'close', 'volume']
+# Trades are batched for this many ms before being ingested, 0 ingests each one as it arrives
+LIVE_BATCH_MS = float(os.getenv('LIVE_BATCH_MS', 5))
 
 class LiveFeeder:
-    def __init__(self, timeframe='1Min', max_bars=500, session_start=time(9, 30)):
-        self.timeframe = pd.Timedelta(timeframe)
-        self.session_start = session_start
-        self.current_bars = {} # {symbol: CustomBar}
-        self.df = pd.DataFrame(columns=['timestamp', 'symbol', 'open', 'high', 'low', 'close', 'volume'])
+    '''
+    Live bars for every (symbol, timeframe) the runners subscribe to, shared by all of them.
+    Each symbol has one BarTree fed once per bar or trade; runners get completed bars of
+    their own timeframe through on_bar and every trade (or one per batch) through on_trade.
+    batch_ms > 0 queues trades and ingests them in one vectorised batch every batch_ms.
+    While timed is set, arrival_ns is the perf_counter_ns at which the event being handed
+    to listeners reached the feed (the oldest trade of a batch), for latency stats.
+    '''
+    def __init__(self, max_bars=500, session_start=time(9, 30), batch_ms=LIVE_BATCH_MS):
         self.max_bars = max_bars
+        self.session_start = session_start
+        self.trees = {} # {symbol: BarTree}
+        self.bar_listeners = {} # {(symbol, Timedelta): [async handler]}
+        self.trade_listeners = {} # {symbol: [async handler]}
         self.last_prices = {}
+        self.batch = batch_ms / 1000
+        self._pending_trades = []
+        self._flush_handle = None
+        self.timed = False
+        self.arrival_ns = 0
+        self._batch_arrival_ns = 0
 
+    def _tree(self, symbol):
+        tree = self.trees.get(symbol)
+        if tree is None:
+            tree = self.trees[symbol] = BarTree(symbol, max_bars=self.max_bars, session_start=self.session_start)
+        return tree
 
-    def _get_bucket_start(self, ts):
-        session_open = ts.normalize() + pd.Timedelta(
-            hours=self.session_start.hour, minutes=self.session_start.minute
-        )
-        offset = (ts - session_open) // self.timeframe
-        return session_open + offset * self.timeframe
-    
-    # this was for testing crypto
-    # def _get_bucket_start(self, ts):
-    #     # Anchor at midnight UTC
-    #     midnight = ts.normalize()  # midnight of that day
-    #     offset = (ts - midnight) // self.timeframe
-    #     return midnight + offset * self.timeframe
-    
-    def _update_dataframe(self, bar):
-        bar_dict = {
-            'timestamp': bar.timestamp,
-            'symbol': bar.symbol,
-            'open': bar.open,
-            'high': bar.high,
-            'low': bar.low,
-            'close': bar.close,
-            'volume': bar.volume
-        }
-
-        mask = (self.df['timestamp'] == bar.timestamp) & (self.df['symbol'] == bar.symbol)
-        if mask.any():
-            idx = self.df[mask].index[0]
-            self.df.loc[idx, 'high'] = max(self.df.loc[idx, 'high'], bar.high)
-            self.df.loc[idx, 'low'] = min(self.df.loc[idx, 'low'], bar.low)
-            self.df.loc[idx, 'close'] = bar.close
-            self.df.loc[idx, 'volume'] += bar.volume
-        else:
-            columns = ['timestamp', 'symbol', 'open', 'high', 'low', 'close', 'volume']
-            self.df = pd.concat([self.df, pd.DataFrame([bar_dict], columns=columns)], ignore_index=True)
-
-    def _update_current_bar(self, symbol, price, size, timestamp):
-        ts = pd.to_datetime(timestamp)
-        bucket_start = self._get_bucket_start(ts)
-        
-        if symbol not in self.current_bars or self.current_bars[symbol].timestamp != bucket_start:
-                
-            self.current_bars[symbol] = CustomBar(
-                symbol=symbol,
-                timestamp=bucket_start,
-                open_price=price,
-                high_price=price,
-                low_price=price,
-                close_price=price,
-                volume=size
-            )
-            return None
-        else:
-            # Update existing bar
-            agg = self.current_bars[symbol]
-            agg.high = max(agg.high, price)
-            agg.low = min(agg.low, price)
-            agg.close = price
-            agg.volume += size
-            self._update_dataframe(agg)
-            # print(f'[DEBUG] Updated current bar: {agg}')
+    def level(self, symbol, timeframe):
+        '''The BarLevel holding symbol's timeframe bars, created if nobody subscribed to it yet.'''
+        return self._tree(symbol).add_timeframe(timeframe)
+
+    def subscribe(self, symbol, timeframe, on_bar=None, on_trade=None):
+        timeframe = self.level(symbol, timeframe).timeframe
+        for listeners, key, handler in ((self.bar_listeners, (symbol, timeframe), on_bar),
+                                        (self.trade_listeners, symbol, on_trade)):
+            if handler is not None and handler not in listeners.setdefault(key, []):
+                listeners[key].append(handler)
+
+    def unsubscribe(self, symbol, timeframe, on_bar=None, on_trade=None):
+        for listeners, key, handler in ((self.bar_listeners, (symbol, pd.Timedelta(timeframe)), on_bar),
+                                        (self.trade_listeners, symbol, on_trade)):
+            if handler is not None and handler in listeners.get(key, []):
+                listeners[key].remove(handler)
+
+    def has_listeners(self, symbol):
+        return bool(self.trade_listeners.get(symbol)) or any(
+            handlers for (s, _), handlers in self.bar_listeners.items() if s == symbol)
+
+    def clear(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._pending_trades = []
+        self.trees = {}
+        self.bar_listeners = {}
+        self.trade_listeners = {}
+        self.last_prices = {}
+        self.timed = False
+
+    def window(self, symbol, lookback=None, timeframe=BASE_TIMEFRAME):
+        tree = self.trees.get(symbol)
+        if tree is None:
             return None
+        return tree.window(timeframe, lookback)
+
+    def df(self, timeframe=BASE_TIMEFRAME):
+        timeframe = pd.Timedelta(timeframe)
+        frames = [tree.levels[timeframe].ring.to_dataframe() for tree in self.trees.values()
+                  if timeframe in tree.levels and tree.levels[timeframe].ring.count]
+        if not frames:
+            return pd.DataFrame(columns=COLUMNS)
+        return pd.concat(frames, ignore_index=True).sort_values('timestamp', kind='stable', ignore_index=True)
 
-    def handle_bar(self, bar):
+    async def _notify(self, handlers, event):
+        for handler in handlers:
+            try:
+                await handler(event)
+            except Exception as e:
+                print(f'[LiveFeeder] Handler failed for {event.symbol}: {e}')
+
+    async def handle_bar(self, bar):
+        print(f'[DEBUG] Incoming 1-min bar from Alpaca → {bar.symbol} @ {bar.timestamp} | O:{bar.open} H:{bar.high} L:{bar.low} C:{bar.close} V:{bar.volume}')
+        if self.timed:
+            arrival = perf_counter_ns()
+        # Trades queued before this bar must land first, as they would unbatched
+        await self.flush_trades()
+        if self.timed:
+            self.arrival_ns = arrival
         self.last_prices[bar.symbol] = bar.close
-        if not hasattr(self, '_bar_buffer'):
-            self._bar_buffer = {}  # {symbol: list of 1-min bars}
-
-        buffer = self._bar_buffer.setdefault(bar.symbol, [])
-        buffer.append(bar)
-        bars_per_custom = int(self.timeframe / pd.Timedelta('1min'))
-
-        if len(buffer) >= bars_per_custom:
-            combined_open = buffer[0].open
-            combined_close = buffer[-1].close
-            combined_high = max(b.high for b in buffer[:bars_per_custom])
-            combined_low = min(b.low for b in buffer[:bars_per_custom])
-            combined_volume = sum(b.volume for b in buffer[:bars_per_custom])
-
-            bucket_start = self._get_bucket_start(pd.to_datetime(buffer[0].timestamp))
-
-            final_bar = CustomBar(
-                symbol=bar.symbol,
-                timestamp=bucket_start,
-                open_price=combined_open,
-                high_price=combined_high,
-                low_price=combined_low,
-                close_price=combined_close,
-                volume=combined_volume
-            )
-
-            self.current_bars[bar.symbol] = final_bar
-            self._update_dataframe(final_bar)
-            print(f'[DEBUG] Final bar committed from Alpaca: {final_bar}')
-            self._bar_buffer[bar.symbol] = buffer[bars_per_custom:]
-            return final_bar
-    
-        return None
-    
-    def handle_trade(self, trade):
-        return self._update_current_bar(trade.symbol, trade.price, trade.size, trade.timestamp)
-    
+        tree = self.trees.get(bar.symbol)
+        if tree is None:
+            return
+        for timeframe, final_bar in tree.update_bar(bar):
+            await self._notify(self.bar_listeners.get((bar.symbol, timeframe), ()), final_bar)
+
+    async def handle_trade(self, trade):
+        if self.timed:
+            self.arrival_ns = perf_counter_ns()
+        if self.batch:
+            if not self._pending_trades:
+                self._batch_arrival_ns = self.arrival_ns
+            self._pending_trades.append(trade)
+            if self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(
+                    self.batch, lambda: asyncio.ensure_future(self.flush_trades()))
+            return
+        tree = self.trees.get(trade.symbol)
+        if tree is None:
+            return
+        tree.update_trade(trade.price, trade.size, trade.timestamp)
+        await self._notify(self.trade_listeners.get(trade.symbol, ()), trade)
+
+    async def flush_trades(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending_trades:
+            return
+        trades, self._pending_trades = self._pending_trades, []
+        self.arrival_ns = self._batch_arrival_ns
+        for trade in self.ingest_trades(trades):
+            await self._notify(self.trade_listeners.get(trade.symbol, ()), trade)
+
+    def ingest_trades(self, trades):
+        '''
+        Feed a batch of trades with integer-ns bucketing and per-bucket reductions.
+        The bars match feeding them one by one. Returns the last trade of each symbol.
+        '''
+        if not trades:
+            return []
+        timestamps = pd.DatetimeIndex([t.timestamp for t in trades])
+        prices = np.fromiter((t.price for t in trades), dtype=float, count=len(trades))
+        sizes = np.fromiter((t.size for t in trades), dtype=float, count=len(trades))
+        symbol_names, symbols = np.unique([t.symbol for t in trades], return_inverse=True)
+
+        # Group by symbol keeping arrival order
+        order = np.argsort(symbols, kind='stable')
+        symbols = symbols[order]
+        starts = np.flatnonzero(np.r_[True, symbols[1:] != symbols[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        last_trades = []
+        for start, end in zip(starts, ends):
+            rows = order[start:end]
+            tree = self.trees.get(symbol_names[symbols[start]])
+            if tree is None:
+                continue
+            tree.update_trades(timestamps[rows], prices[rows], sizes[rows])
+            last_trades.append(trades[rows[-1]])
+        return last_trades
+
     def get_last_price(self, symbol):
         return self.last_prices[symbol]
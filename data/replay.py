@@ -0,0 +1,155 @@
+import os
+import time
+import asyncio
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from data.custom_bars import CustomBar
+
+BAR_COLUMNS = ['timestamp', 'symbol', 'open', 'high', 'low', 'close', 'volume']
+TRADE_COLUMNS = ['timestamp', 'symbol', 'price', 'size']
+
+class ReplayTrade:
+    def __init__(self, symbol, timestamp, price, size):
+        self.symbol = symbol
+        self.timestamp = timestamp
+        self.price = price
+        self.size = size
+
+    def __repr__(self):
+        return f'<Trade {self.symbol} {self.timestamp} P:{self.price} S:{self.size}>'
+
+
+def _read_events(source, columns):
+    '''DataFrame or .parquet/.csv path -> frame with the given columns, timestamps in UTC.'''
+    if source is None:
+        return pd.DataFrame(columns=columns)
+    if not isinstance(source, pd.DataFrame):
+        path = Path(source)
+        source = pd.read_csv(path) if path.suffix == '.csv' else pd.read_parquet(path)
+    # Cached bar files are indexed by (symbol, timestamp)
+    frame = source.reset_index() if any(name in columns for name in source.index.names) else source
+    missing = [c for c in columns if c not in frame.columns]
+    if missing:
+        raise ValueError(f'Replay data is missing columns {missing}')
+    frame = frame[columns].copy()
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'], utc=True)
+    return frame
+
+
+class ReplayStream:
+    '''
+    Offline stand-in for StockDataStream. Replays bars and trades from local files
+    (parquet or csv, or DataFrames) in time order through the same subscribe_bars /
+    subscribe_trades / _run_forever / stop surface, so MarketDataHub(stream=ReplayStream(...))
+    drives the live pipeline with no network.
+    speed=1 replays in real time, speed=N N times faster, speed=None as fast as possible.
+    Bars are stamped with their start time and emitted when they close, like Alpaca's.
+    '''
+    def __init__(self, bars=None, trades=None, speed=None, bar_timeframe='1Min'):
+        self.speed = speed
+        self._handlers = {'bars': {}, 'trades': {}}
+        self._running = False
+        self._should_run = False
+        self._loop = None
+        self._position = 0  # next event to emit, kept across stop() so run resumes
+        self.events_sent = 0
+        self.max_lag = 0.0  # worst lateness behind the replay clock, seconds
+        self.elapsed = 0.0
+
+        bars = _read_events(bars, BAR_COLUMNS)
+        trades = _read_events(trades, TRADE_COLUMNS)
+        bar_delay = pd.Timedelta(bar_timeframe).value
+        emit_ns = np.concatenate([pd.DatetimeIndex(bars['timestamp']).asi8 + bar_delay,
+                                  pd.DatetimeIndex(trades['timestamp']).asi8])
+        # Bars before trades at the same instant, as a bar closes before the next one starts trading
+        kinds = np.concatenate([np.zeros(len(bars), dtype=np.int8), np.ones(len(trades), dtype=np.int8)])
+        rows = np.concatenate([np.arange(len(bars)), np.arange(len(trades))])
+        order = np.lexsort((kinds, emit_ns))
+        self._emit_ns = emit_ns[order]
+        self._kinds = kinds[order]
+        self._rows = rows[order]
+        self._bar_values = [bars[c].to_numpy() for c in BAR_COLUMNS]
+        self._trade_values = [trades[c].to_numpy() for c in TRADE_COLUMNS]
+
+    @classmethod
+    def from_env(cls):
+        '''Stream from REPLAY_BARS / REPLAY_TRADES / REPLAY_SPEED, or None when neither file is set.'''
+        bars, trades = os.getenv('REPLAY_BARS'), os.getenv('REPLAY_TRADES')
+        if not bars and not trades:
+            return None
+        speed = os.getenv('REPLAY_SPEED')
+        return cls(bars=bars, trades=trades, speed=float(speed) if speed else None)
+
+    def __len__(self):
+        return len(self._emit_ns)
+
+    def subscribe_bars(self, handler, *symbols):
+        for symbol in symbols:
+            self._handlers['bars'][symbol] = handler
+
+    def subscribe_trades(self, handler, *symbols):
+        for symbol in symbols:
+            self._handlers['trades'][symbol] = handler
+
+    def unsubscribe_bars(self, *symbols):
+        for symbol in symbols:
+            self._handlers['bars'].pop(symbol, None)
+
+    def unsubscribe_trades(self, *symbols):
+        for symbol in symbols:
+            self._handlers['trades'].pop(symbol, None)
+
+    async def _send_subscribe_msg(self):
+        # Nothing to tell a server, handlers registered while running are picked up on the next event
+        pass
+
+    def _event(self, kind, row):
+        if kind == 0:
+            timestamp, symbol, open_price, high_price, low_price, close_price, volume = (v[row] for v in self._bar_values)
+            return 'bars', CustomBar(symbol, timestamp, open_price, high_price, low_price, close_price, volume)
+        timestamp, symbol, price, size = (v[row] for v in self._trade_values)
+        return 'trades', ReplayTrade(symbol, timestamp, price, size)
+
+    async def _run_forever(self):
+        self._loop = asyncio.get_running_loop()
+        self._running = True
+        self._should_run = True
+        started = time.perf_counter()
+        first = self._position
+        try:
+            while self._should_run and self._position < len(self._emit_ns):
+                i = self._position
+                if self.speed:
+                    due = (self._emit_ns[i] - self._emit_ns[first]) / 1e9 / self.speed
+                    wait = due - (time.perf_counter() - started)
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    else:
+                        self.max_lag = max(self.max_lag, -wait)
+                elif (i - first) % 1000 == 999:
+                    # Let stop() and other tasks in when nothing else would yield
+                    await asyncio.sleep(0)
+
+                channel, event = self._event(self._kinds[i], self._rows[i])
+                handlers = self._handlers[channel]
+                handler = handlers.get(event.symbol) or handlers.get('*')
+                self._position += 1
+                if handler is not None:
+                    await handler(event)
+                    self.events_sent += 1
+        finally:
+            self.elapsed += time.perf_counter() - started
+            self._running = False
+
+    def run(self):
+        asyncio.run(self._run_forever())
+
+    def stop(self):
+        self._should_run = False
+
+    def rewind(self):
+        self._position = 0
+        self.events_sent = 0
+        self.max_lag = 0.0
+        self.elapsed = 0.0
@@ -2,17 +2,44 @@ from core.strategy_loader import (discover_strategies, read_strategy_code, save_
                                    delete_strategy_file, add_strategy_file, validate_strategy_code,
                                      generate_strategy_filename, get_strategy_name)
 from core.backtester import BackTester
+from core.backtest_pool import run_backtests as run_pooled_backtests
+from core.param_sweep import sweep
+from core.result_cache import ResultCache, result_id
+from core.trade_table import TradeTable
+from core.jobs import JobQueue
+from core.walk_forward import run_walk_forward
 from core.strategy_manager import LiveStrategyManager
+from core.live_engine import LiveEngine
+from core.checkpoint import CHECKPOINT_DIR
+from core.market_data_hub import MarketDataHub
+from data.replay import ReplayStream
 import asyncio
 import numpy as np
 
 live_running = False
-manager = LiveStrategyManager()
+# REPLAY_BARS / REPLAY_TRADES point live testing at local files instead of Alpaca
+replay_stream = ReplayStream.from_env()
+manager = LiveStrategyManager(hub=MarketDataHub(stream=replay_stream) if replay_stream else None,
+                              checkpoint_dir=CHECKPOINT_DIR, record_latency=True)
+engine = LiveEngine(manager, session_path=CHECKPOINT_DIR / 'session.json')
+# Backtest results stay on the server, the dashboard passes their result ID around
+result_cache = ResultCache()
+# Dashboard backtests run here in the background, shared by every browser session
+backtest_jobs = JobQueue()
 active_strategies = []
 current_symbol = "AAPL"
 current_balance = 10000
 current_timeframe = "1Min"
 
+# A session the previous process was still running resumes from its checkpoints
+saved_session = engine.saved_session()
+if saved_session:
+    live_running = True
+    active_strategies = saved_session['strategies']
+    current_symbol = saved_session['symbol']
+    current_balance = saved_session['starting_balance']
+    current_timeframe = saved_session['timeframe']
+
 def get_strategies(refresh=False):
     return discover_strategies(refresh=refresh)
 
@@ -68,62 +95,99 @@ def run_backtest(strategy_name, symbol, start_date, end_date, starting_balance,
     pnl_history, trade_history, summary = backtester.run(symbol=symbol, timeframe=timeframe, start=start_date, end=end_date)
     return pnl_history, trade_history, summary
 
-async def run_live():
-    global live_running
-    print("--- run_live started ---")
-
-    while True:  # never exits
-        if live_running and active_strategies:
-            try:
-                print(f"Running with: {active_strategies}, {current_symbol}, {current_balance}, {current_timeframe}")
-
-                manager.clear_all()
-
-                if len(active_strategies) > 1:
-                    raise NotImplementedError("Current version cannot run multiple strategies")
-
-                # Get strategy
-                strategies = get_strategies()
-                strategy_name = active_strategies[0]
-
-                if strategy_name not in strategies:
-                    raise ValueError(f"Unknown strategy: {strategy_name}")
+def run_portfolio_backtest(strategy_name, symbols, start_date, end_date, starting_balance, timeframe):
+    """Backtest one strategy across a list of symbols with a single shared broker."""
+    strategies = get_strategies()
+    if strategy_name not in strategies:
+        raise ValueError(f'Unknown strategy: {strategy_name}')
+    backtester = BackTester(strategy=strategies[strategy_name](), starting_balance=starting_balance)
+    return backtester.run_portfolio(symbols=symbols, timeframe=timeframe, start=start_date, end=end_date)
 
-                strategy_class = strategies[strategy_name]
-                strategy_instance = strategy_class()
+def run_backtests(strategy_names, symbol, start_date, end_date, starting_balance, timeframe, progress=None):
+    """Run several strategies over one fetch of the data, each in its own process."""
+    strategies = get_strategies()
+    for name in strategy_names:
+        if name not in strategies:
+            raise ValueError(f'Unknown strategy: {name}')
+    return run_pooled_backtests(strategy_names, symbol=symbol, timeframe=timeframe, start=start_date,
+                                end=end_date, starting_balance=starting_balance, progress=progress)
+
+def run_cached_backtests(strategy_names, symbol, start_date, end_date, starting_balance, timeframe, progress=None):
+    """run_backtests through the result cache. Returns (result_id, {strategy_name: summary})."""
+    # The strategies' code is part of the key so an edited strategy isn't served a stale result
+    params = dict(strategies={name: read_code(name) for name in strategy_names}, symbol=symbol,
+                  start_date=start_date, end_date=end_date, starting_balance=starting_balance, timeframe=timeframe)
+    key = result_id(params)
+    results = result_cache.get(key)
+    if results is None:
+        results = run_backtests(strategy_names, symbol, start_date, end_date, starting_balance, timeframe, progress=progress)
+        result_cache.put(key, results)
+    return key, {name: summary for name, (_, _, summary) in results.items()}
+
+def submit_backtest(strategy_names, symbol, start_date, end_date, starting_balance, timeframe):
+    """Queue run_cached_backtests as a background job. Returns the job ID for backtest_status() and cancel_backtest()."""
+    return backtest_jobs.submit(run_cached_backtests, len(strategy_names), strategy_names, symbol,
+                                start_date, end_date, starting_balance, timeframe)
+
+def backtest_status(job_id):
+    """status, progress (0-1), queue position, result ((result_id, summaries) once done) and error of a job."""
+    return backtest_jobs.status(job_id)
+
+def cancel_backtest(job_id):
+    backtest_jobs.cancel(job_id)
+
+def get_backtest_results(key):
+    """{strategy_name: (pnl_history, trade_history, summary)} of a cached run, None once evicted."""
+    return result_cache.get(key) if key else None
+
+def get_trade_table(key, strategy_names):
+    """TradeTable of strategy_names' trades in a cached run, built once and cached beside it. None once evicted."""
+    table_key = f'{key}/trades/{",".join(sorted(strategy_names))}'
+    table = result_cache.get(table_key)
+    if table is None:
+        results = get_backtest_results(key)
+        if results is None:
+            return None
+        table = TradeTable({name: trades for name, (_, trades, _) in results.items() if name in strategy_names})
+        result_cache.put(table_key, table)
+    return table
+
+def run_sweep(strategy_name, param_grid, symbol, start_date, end_date, starting_balance, timeframe, metric='sharpe'):
+    """Backtest every parameter combination in param_grid and return [(params, summary)] ranked by metric."""
+    return sweep(strategy_name, param_grid, symbol=symbol, timeframe=timeframe, start=start_date,
+                 end=end_date, starting_balance=starting_balance, metric=metric)
+
+def run_walk_forward_backtest(strategy_name, symbol, start_date, end_date, starting_balance, timeframe,
+                              train, test, step=None, param_grid=None, metric='sharpe'):
+    """Walk-forward backtest, returns the stitched out-of-sample (pnl_history, trade_history) and per-window summaries."""
+    return run_walk_forward(strategy_name, symbol=symbol, timeframe=timeframe, start=start_date, end=end_date,
+                            train=train, test=test, step=step, param_grid=param_grid, metric=metric,
+                            starting_balance=starting_balance)
 
-                manager.add_strategy(
-                    strategy=strategy_instance,
-                    strategy_name=strategy_instance.name,
-                    symbol=current_symbol,
-                    timeframe=current_timeframe,
-                    starting_balance=current_balance
-                )
+async def run_live():
+    """Run the live engine on this thread's event loop. It sleeps until start_live() sends it a command."""
+    print("--- run_live started ---")
+    await engine.run()
 
-                # Inner loop while live_running is true
-                while live_running:
-                    print("run_live loop iteration started")
-                    try:
-                        await manager.run_all()
-                    except Exception as e:
-                        print("Exception inside manager.run_all():", e)
-                    await asyncio.sleep(0.1)
-                    print("run_live loop iteration ended")
+def live_config():
+    return dict(strategies=list(active_strategies), symbol=current_symbol,
+                timeframe=current_timeframe, starting_balance=current_balance)
 
-            except Exception as e:
-                print("Error in run_live:", e)
+def start_live():
+    global live_running
+    live_running = True
+    print(f"Running with: {active_strategies}, {current_symbol}, {current_balance}, {current_timeframe}")
+    engine.start(**live_config())
 
-        else:
-            # Not running, just idle
-            await asyncio.sleep(0.5)
+def reconfigure_live():
+    """Add or drop runners for the current active strategies without restarting the others."""
+    if live_running:
+        engine.reconfigure(**live_config())
 
 def stop_live():
     global live_running
     live_running = False
-    try:
-        manager.stop_current()
-    except Exception as e:
-        print('Error while stopping live:', e)
+    engine.stop()
 
 # async def run_live(selected_strategies: list[dict]):
 #     global live_running
@@ -1,10 +1,19 @@
-from dash import html, dcc, Input, Output, State, dash, callback, ALL
+from dash import html, dcc, Input, Output, State, dash, callback, ctx, ALL
 import main
+from core.downsample import changes_x, relayout_range, downsample_frame
 import plotly.graph_objects as go
 import pandas as pd
 
+# Page and sort order of the trades table, the sort keys are TradeTable columns
+TRADES_VIEW = {'page': 0, 'sort': 'timestamp', 'ascending': True}
+TRADES_COLUMNS = [('Strategy', 'strategy'), ('Symbol', 'symbol'), ('Side', 'side'),
+                  ('Time', 'timestamp'), ('Price', 'price'), ('Quantity', 'quantity')]
+
 layout = html.Div(className='page-content', children=[
     dcc.Store(id='backtest-results', data={}),
+    dcc.Store(id='bt-trades-view', data=TRADES_VIEW),
+    dcc.Store(id='bt-job', data={}),
+    dcc.Interval(id='bt-job-poll', interval=500, disabled=True),
 
     html.H1('Back Testing', className='page-title', style={
         'position': 'absolute',
@@ -62,15 +71,16 @@ layout = html.Div(className='page-content', children=[
                 html.Table(className='trades-table', children=[
                     html.Thead([
                         html.Tr([
-                            html.Th('Strategy'),
-                            html.Th('Symbol'),
-                            html.Th('Side'),
-                            html.Th('Time'),
-                            html.Th('Price'),
-                            html.Th('Quantity'),
+                            html.Th(label, id={'type': 'bt-trades-sort', 'index': column}, className='sortable', n_clicks=0)
+                            for label, column in TRADES_COLUMNS
                         ])
                     ]),
                     html.Tbody(id='bt-trades-card-body')  # initially empty
+                ]),
+                html.Div(className='trades-pager', children=[
+                    html.Button('‹', id='bt-trades-prev', className='button', n_clicks=0),
+                    html.Span(id='bt-trades-page-label'),
+                    html.Button('›', id='bt-trades-next', className='button', n_clicks=0)
                 ])
             ]),
         ]),
@@ -84,14 +94,29 @@ layout = html.Div(className='page-content', children=[
                     style={'display': 'flex', 'justify-content': 'space-between', 'align-items': 'center'},
                     children=[
                         html.H3('Controls', className='card-title'),
-                        html.Button(
-                            'Run Backtest',
-                            className='button',
-                            id='run-backtest-btn',
-                            n_clicks=0
+                        html.Div(
+                            style={'display': 'flex', 'gap': '8px'},
+                            children=[
+                                html.Button(
+                                    'Run Backtest',
+                                    className='button',
+                                    id='run-backtest-btn',
+                                    n_clicks=0
+                                ),
+                                html.Button(
+                                    'Cancel',
+                                    className='button',
+                                    id='cancel-backtest-btn',
+                                    n_clicks=0
+                                )
+                            ]
                         )
                     ]
                 ),
+                html.Div(className='job-status', children=[
+                    html.Progress(id='bt-job-progress', value=0, max=100),
+                    html.Span(id='bt-job-status')
+                ]),
 
                 # === Collapsible section for parameters ===    
                 html.Details(open=False, children=[
@@ -177,62 +202,86 @@ layout = html.Div(className='page-content', children=[
 
 # === Run Backtest and Store Results ===
 @callback(
+    Output('bt-job', 'data'),
     Output('backtest-results', 'data'),
+    Output('bt-job-status', 'children'),
+    Output('bt-job-progress', 'value'),
+    Output('bt-job-poll', 'disabled'),
     Input('run-backtest-btn', 'n_clicks'),
+    Input('cancel-backtest-btn', 'n_clicks'),
+    Input('bt-job-poll', 'n_intervals'),
     State('symbol-input', 'value'),
     State('start-date-input', 'value'),
     State('end-date-input', 'value'),
     State('balance-input', 'value'),
     State('timeframe-input', 'value'),
     State({'type': 'toggle', 'index': ALL}, 'className'),
+    State('bt-job', 'data'),
     prevent_initial_call=True
 )
-def run_backtest_action(n_clicks, symbol, start_date, end_date, balance, timeframe, toggle_classes):
-    if not n_clicks:
-        raise dash.exceptions.PreventUpdate
-
-    strategy_names = main.list_strategy_names()
-    active_strategies = [
-        name for name, cls in zip(strategy_names, toggle_classes) 
-        if cls and 'active' in cls
-    ]
-    if not active_strategies:
-        return {}
-    
-    results = {}
-    run_params = {
-        'symbol': symbol,
-        'start_date': start_date,
-        'end_date': end_date,
-        'balance': balance,
-        'timeframe': timeframe,
-    }
-
-    for strat in active_strategies:
-        if strat in results:
-            continue
-        pnl_history, trade_history, summary = main.run_backtest(
-            strategy_name=strat,
+def run_backtest_action(n_clicks, cancel_clicks, n_intervals, symbol, start_date, end_date, balance, timeframe,
+                        toggle_classes, job):
+    # The backtest runs as a background job: this only queues it, then polls it until it finishes
+    triggered = ctx.triggered_id
+    job_id = (job or {}).get('job_id')
+
+    if triggered == 'cancel-backtest-btn':
+        if job_id:
+            main.cancel_backtest(job_id)
+        return dash.no_update, dash.no_update, 'Cancelling...', dash.no_update, dash.no_update
+
+    if triggered == 'run-backtest-btn':
+        strategy_names = main.list_strategy_names()
+        active_strategies = [
+            name for name, cls in zip(strategy_names, toggle_classes)
+            if cls and 'active' in cls
+        ]
+        if not active_strategies:
+            return dash.no_update, {}, '', 0, True
+        if job_id:
+            # A new run replaces this session's previous one
+            main.cancel_backtest(job_id)
+
+        run_params = {
+            'symbol': symbol,
+            'start_date': start_date,
+            'end_date': end_date,
+            'balance': balance,
+            'timeframe': timeframe,
+        }
+        job_id = main.submit_backtest(
+            strategy_names=active_strategies,
             symbol=symbol,
             start_date=start_date,
             end_date=end_date,
             starting_balance=float(balance),
             timeframe=timeframe
         )
-
-        strat_results = {
-            'pnl_history': pnl_history.to_dict('records') if hasattr(pnl_history, 'to_dict') else pnl_history,
-            'trade_history': trade_history.to_dict('records') if hasattr(trade_history, 'to_dict') else trade_history,
-            'summary': summary
-        }
-        results[strat] = strat_results
-
-    return {
-        'params_hash': run_params,
-        'strategies': results,
-        'params': run_params,
-        'active_strategies': active_strategies
+        job = {'job_id': job_id, 'params': run_params, 'active_strategies': active_strategies}
+        return job, dash.no_update, 'Queued', 0, False
+
+    status = main.backtest_status(job_id) if job_id else None
+    if status is None:
+        return dash.no_update, dash.no_update, '', 0, True
+    percent = round(status['progress'] * 100)
+    if status['status'] == 'queued':
+        return dash.no_update, dash.no_update, f'Queued (position {status["position"]})', 0, False
+    if status['status'] == 'running':
+        return dash.no_update, dash.no_update, f'Running... {percent}%', percent, False
+    if status['status'] == 'failed':
+        return dash.no_update, dash.no_update, f'Failed: {status["error"]}', percent, True
+    if status['status'] == 'cancelled':
+        return dash.no_update, dash.no_update, 'Cancelled', percent, True
+
+    # The histories stay in main's result cache, the store only carries their ID and the summaries
+    result_id, summaries = status['result']
+    results = {
+        'result_id': result_id,
+        'strategies': {strat: {'summary': summary} for strat, summary in summaries.items()},
+        'params': job['params'],
+        'active_strategies': job['active_strategies']
     }
+    return dash.no_update, results, 'Done', 100, True
 
 # === Update PNL Graph ===
 @callback(
@@ -241,11 +290,20 @@ def run_backtest_action(n_clicks, symbol, start_date, end_date, balance, timefra
     Output('bt-pnl-strategy-filter', 'value'),
     Input('backtest-results', 'data'),
     Input('bt-pnl-strategy-filter', 'value'),
+    Input('bt-pnl-graph', 'relayoutData'),
     State({'type': 'toggle', 'index': ALL}, 'className'),
     prevent_initial_call=True
 )
-def update_pnl_graph(backtest_data, filter_value, toggle_classes):
-    if not backtest_data or 'strategies' not in backtest_data:
+def update_pnl_graph(backtest_data, filter_value, relayout, toggle_classes):
+    # A zoom or pan re-queries the visible span of the cached histories, anything else redraws it all
+    x_range = None
+    if ctx.triggered_id == 'bt-pnl-graph':
+        if not changes_x(relayout):
+            return dash.no_update, dash.no_update, dash.no_update
+        x_range = relayout_range(relayout)
+
+    results = main.get_backtest_results(backtest_data.get('result_id')) if backtest_data else None
+    if results is None:
         return go.Figure().update_layout(
             title='PNL',
             xaxis_title='Time',
@@ -253,7 +311,6 @@ def update_pnl_graph(backtest_data, filter_value, toggle_classes):
             template='plotly_dark'
         ), dash.no_update, dash.no_update
 
-    results = backtest_data['strategies']
     strategy_names = main.list_strategy_names()
     active_strategies = [
         name for name, cls in zip(strategy_names, toggle_classes)
@@ -277,20 +334,22 @@ def update_pnl_graph(backtest_data, filter_value, toggle_classes):
         filter_value = 'all'
 
     fig = go.Figure()
-    for strat, data in results.items():
+    for strat, (pnl_history, _, _) in results.items():
         if filter_value != 'all' and strat != filter_value:
             continue
 
-        pnl_history = data.get('pnl_history', [])
-        times = [log['timestamp'] for log in pnl_history]
-        pnl = [log['portfolio_value'] for log in pnl_history]
-        fig.add_trace(go.Scatter(x=times, y=pnl, mode='lines', name=strat))
+        if not pnl_history.empty:
+            # About 2k points per trace, at full resolution once zoomed in far enough
+            times, pnl = downsample_frame(pnl_history, x_range=x_range)
+            fig.add_trace(go.Scatter(x=times, y=pnl, mode='lines', name=strat))
 
     fig.update_layout(
         title='PNL' if filter_value == 'all' else f'PNL ({filter_value})',
         xaxis_title='Time',
         yaxis_title='Portfolio Value',
-        template='plotly_dark'
+        template='plotly_dark',
+        # Keeps the user's zoom while the same run and filter are redrawn
+        uirevision=f"{backtest_data['result_id']}-{filter_value}"
     )
     return fig, options, filter_value
 
@@ -299,45 +358,61 @@ def update_pnl_graph(backtest_data, filter_value, toggle_classes):
     Output('bt-trades-strategy-filter', 'options'),
     Output('bt-trades-strategy-filter', 'value'),
     Output('bt-trades-card-body', 'children'),
+    Output('bt-trades-page-label', 'children'),
+    Output('bt-trades-view', 'data'),
     Input('backtest-results', 'data'),
     Input('bt-trades-strategy-filter', 'value'),
+    Input('bt-trades-prev', 'n_clicks'),
+    Input('bt-trades-next', 'n_clicks'),
+    Input({'type': 'bt-trades-sort', 'index': ALL}, 'n_clicks'),
+    State('bt-trades-view', 'data'),
     State({'type': 'toggle', 'index': ALL}, 'className'),
     prevent_initial_call=True
 )
-def update_trades_table(backtest_data, filter_value, toggle_classes):
-    if not backtest_data or 'strategies' not in backtest_data:
-        return dash.no_update, dash.no_update, []
-
-    results = {
-        k: v for k, v in backtest_data['strategies'].items()
-        if k in [name for name, cls in zip(main.list_strategy_names(), toggle_classes) if cls and 'active' in cls]
-    }
-
-    if not results:
-        return dash.no_update, dash.no_update, []
+def update_trades_table(backtest_data, filter_value, prev_clicks, next_clicks, sort_clicks, view, toggle_classes):
+    active_strategies = [name for name, cls in zip(main.list_strategy_names(), toggle_classes) if cls and 'active' in cls]
+    names = [name for name in (backtest_data or {}).get('strategies', {}) if name in active_strategies]
+    # Only the visible page is rendered, from a table kept beside the cached results
+    table = main.get_trade_table(backtest_data.get('result_id'), names) if names else None
+    if table is None:
+        return dash.no_update, dash.no_update, [], '', dash.no_update
 
     options = [{'label': 'All Strategies', 'value': 'all'}] + [
-        {'label': name, 'value': name} for name in results.keys()
+        {'label': name, 'value': name} for name in names
     ]
     if filter_value not in [opt['value'] for opt in options]:
         filter_value = 'all'
+    strategy = None if filter_value == 'all' else filter_value
+
+    view = dict(view or TRADES_VIEW)
+    triggered = ctx.triggered_id
+    if triggered == 'bt-trades-prev':
+        view['page'] -= 1
+    elif triggered == 'bt-trades-next':
+        view['page'] += 1
+    elif isinstance(triggered, dict) and triggered.get('type') == 'bt-trades-sort':
+        view['ascending'] = not view['ascending'] if view['sort'] == triggered['index'] else True
+        view['sort'] = triggered['index']
+        view['page'] = 0
+    else:
+        view['page'] = 0
+    pages = table.pages(strategy=strategy)
+    view['page'] = min(max(view['page'], 0), pages - 1)
 
+    trades = table.page(view['page'], strategy=strategy, sort=view['sort'], ascending=view['ascending'])
     rows = []
-    for strat, data in results.items():
-        if filter_value != 'all' and strat != filter_value:
-            continue
-        trade_history = data.get('trade_history', [])
-        for log in trade_history:
-            rows.append(html.Tr([
-                html.Td(strat),
-                html.Td(log.get('symbol', '')),
-                html.Td(html.Span(log.get('side', ''), className=f'tag {log.get("side","").lower()}')),
-                html.Td(str(pd.to_datetime(log.get('timestamp', '')).strftime('%Y-%m-%d %H:%M'))),
-                html.Td(f'${log.get("price", ""):,.2f}'),
-                html.Td(f'{log.get("quantity", 0):,.4f}')
-            ]))
-
-    return options, filter_value, rows
+    for log in trades.to_dict('records'):
+        rows.append(html.Tr([
+            html.Td(log['strategy']),
+            html.Td(log.get('symbol', '')),
+            html.Td(html.Span(log.get('side', ''), className=f'tag {log.get("side","").lower()}')),
+            html.Td(str(pd.to_datetime(log.get('timestamp', '')).strftime('%Y-%m-%d %H:%M'))),
+            html.Td(f'${log.get("price", ""):,.2f}'),
+            html.Td(f'{log.get("quantity", 0):,.4f}')
+        ]))
+
+    label = f'Page {view["page"] + 1} of {pages} ({table.count(strategy):,} trades)'
+    return options, filter_value, rows, label, view
 
 # === Update Metrics ===
 @callback(
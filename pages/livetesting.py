@@ -1,10 +1,39 @@
-from dash import html, dcc, Input, Output, State, callback, ALL
+from dash import html, dcc, Input, Output, State, callback, ctx, ALL, no_update
 import main
+from core.downsample import changes_x, relayout_range, downsample_frame
 import plotly.graph_objects as go
+import pandas as pd
+
+# Points a live PNL trace keeps as ticks extend it, older ones scroll off
+LIVE_MAX_POINTS = 5000
+
+# Page and sort order of the trades table, newest first, the sort keys are TradeTable columns
+TRADES_VIEW = {"page": 0, "sort": "timestamp", "ascending": False}
+TRADES_COLUMNS = [("Strategy", "strategy"), ("Symbol", "symbol"), ("Side", "side"),
+                  ("Time", "timestamp"), ("Price", "price"), ("Quantity", "quantity")]
+
+# Latency stages shown under each strategy's metrics, as (LatencyStats stage, label)
+LATENCY_STAGES = [("ingest", "Feed → Runner"), ("queue", "Signal Queue"), ("signal", "generate_signals"), ("fill", "Tick → Fill")]
+
+
+def latency_lines(latency):
+    if not latency:
+        return []
+    lines = [html.H5("Latency (p50 / p99 / max µs)")]
+    for stage, label in LATENCY_STAGES:
+        stats = latency[stage]
+        if stats["count"]:
+            lines.append(html.P(f"{label}: {stats['p50_us']:,.1f} / {stats['p99_us']:,.1f} / {stats['max_us']:,.1f}"))
+    lines.append(html.P(f"Queue Depth: {latency['queue_depth']} (max {latency['max_queue_depth']})"))
+    lines.append(html.P(f"Dropped Evaluations: {latency['dropped']}"))
+    return lines
+
 
 layout = html.Div(className="page-content", children=[
     dcc.Store(id="live-results", data={}),
     dcc.Store(id="lt-sync", data={}),
+    dcc.Store(id="live-pnl-cursors", data={}),
+    dcc.Store(id="trades-view", data=TRADES_VIEW),
 
     html.H1("Live Testing", className="page-title", style={
         "position": "absolute",
@@ -72,15 +101,16 @@ layout = html.Div(className="page-content", children=[
                 html.Table(className="trades-table", children=[
                     html.Thead([
                         html.Tr([
-                            html.Th("Strategy"),
-                            html.Th("Symbol"),
-                            html.Th("Side"),
-                            html.Th("Time"),
-                            html.Th("Price"),
-                            html.Th("Quantity"),
+                            html.Th(label, id={"type": "trades-sort", "index": column}, className="sortable", n_clicks=0)
+                            for label, column in TRADES_COLUMNS
                         ])
                     ]),
                     html.Tbody(id="trades-card-body")  # initially empty
+                ]),
+                html.Div(className="trades-pager", children=[
+                    html.Button("‹", id="trades-prev", className="button", n_clicks=0),
+                    html.Span(id="trades-page-label"),
+                    html.Button("›", id="trades-next", className="button", n_clicks=0)
                 ])
             ]),
         ]),
@@ -206,6 +236,8 @@ def run_livetest(n_clicks_live, symbol, balance, timeframe, strategy_clicks):
         main.stop_live()
         return {"running": False, "strategies": []}
 
+    main.start_live()
+
     print(">>> Callback fired")
     print("   is_active:", is_active)
     print("   active_strategies:", active_strategies)
@@ -216,20 +248,27 @@ def run_livetest(n_clicks_live, symbol, balance, timeframe, strategy_clicks):
 # === Update PNL Graph ===
 @callback(
     Output("pnl-graph", "figure"),
+    Output("pnl-graph", "extendData"),
     Output("pnl-strategy-filter", "options"),
     Output("pnl-strategy-filter", "value"),
+    Output("pnl-graph", "relayoutData"),
+    Output("live-pnl-cursors", "data"),
     Input("live-update-interval", "n_intervals"),
     Input("pnl-strategy-filter", "value"),
+    Input("pnl-graph", "relayoutData"),
+    State("live-pnl-cursors", "data"),
     prevent_initial_call=False
 )
 
-def update_live_pnl(n_intervals, filter_value):
-    results = main.manager.get_all_results()
+def update_live_pnl(n_intervals, filter_value, relayout, cursors):
+    if ctx.triggered_id == "pnl-graph" and not changes_x(relayout):
+        return no_update, no_update, no_update, no_update, no_update, no_update
 
     active_strategies = main.get_active_strategies()
-    results = {k: v for k, v in results.items() if k in active_strategies}
+    runners = {r["name"]: id(r["runner"]) for r in main.manager.runners if r["name"] in active_strategies}
+    names = list(runners)
 
-    if not results:
+    if not names:
         empty_fig = go.Figure().update_layout(
             title="PNL",
             xaxis_title="Time",
@@ -237,77 +276,122 @@ def update_live_pnl(n_intervals, filter_value):
             template="plotly_dark"
         )
         default_options = [{"label": "All Strategies", "value": "all"}]
-        return empty_fig, default_options, 'all'
+        return empty_fig, no_update, default_options, 'all', no_update, {}
 
     options = [{"label": "All Strategies", "value": "all"}] + [
-        {"label": name, "value": name} for name in results.keys()
+        {"label": name, "value": name} for name in names
     ]
     if filter_value not in [opt["value"] for opt in options]:
         filter_value = "all"
-
+    shown = [name for name in names if filter_value == "all" or name == filter_value]
+    # A restarted session has new runners under the same names, their curves start over
+    traces = [[name, runners[name]] for name in shown]
+
+    # Ticks only send the points recorded since the last one (cursors holds how many each trace has),
+    # the figure is redrawn when the filter, the zoom or the set of runners changes
+    reset_zoom = ctx.triggered_id == "pnl-strategy-filter"
+    redraw = ctx.triggered_id != "live-update-interval" or not cursors or cursors.get("traces") != traces
+    if not redraw:
+        xs, ys, extended, rows = [], [], [], []
+        for i, (name, sent) in enumerate(zip(shown, cursors["rows"])):
+            times, values = main.manager.get_equity(name, sent)
+            rows.append(sent + len(values))
+            if len(values):
+                xs.append(times)
+                ys.append(values)
+                extended.append(i)
+        if not extended:
+            return no_update, no_update, options, filter_value, no_update, no_update
+        return (no_update, [{"x": xs, "y": ys}, extended, LIVE_MAX_POINTS], options, filter_value,
+                no_update, {"traces": traces, "rows": rows})
+
+    x_range = None if reset_zoom else relayout_range(relayout)
     fig = go.Figure()
-    for strat, data in results.items():
-        if filter_value != "all" and strat != filter_value:
-            continue
-
-        pnl = data["pnl_history"]
-        if not pnl.empty:
-            fig.add_trace(go.Scatter(
-                x=pnl["timestamp"], y=pnl["portfolio_value"],
-                mode="lines", name=strat
-            ))
+    rows = []
+    for name in shown:
+        times, values = main.manager.get_equity(name)
+        rows.append(len(values))
+        pnl = pd.DataFrame({"timestamp": times, "portfolio_value": values})
+        times, values = downsample_frame(pnl, x_range=x_range)
+        # One trace per strategy, even empty, so extendData's trace indices line up
+        fig.add_trace(go.Scatter(
+            x=times, y=values,
+            mode="lines", name=name
+        ))
 
     fig.update_layout(
         title="PNL" if filter_value == "all" else f"PNL ({filter_value})",
         xaxis_title="Time",
         yaxis_title="Portfolio Value",
-        template="plotly_dark"
+        template="plotly_dark",
+        uirevision=filter_value
     )
-    return fig, options, filter_value
+    return (fig, no_update, options, filter_value, None if reset_zoom else no_update,
+            {"traces": traces, "rows": rows})
 
 # === Update Trades Table ===
 @callback(
     Output("trades-strategy-filter", "options"),
     Output("trades-strategy-filter", "value"),
     Output("trades-card-body", "children"),
+    Output("trades-page-label", "children"),
+    Output("trades-view", "data"),
     Input("live-update-interval", "n_intervals"),
     Input("trades-strategy-filter", "value"),
+    Input("trades-prev", "n_clicks"),
+    Input("trades-next", "n_clicks"),
+    Input({"type": "trades-sort", "index": ALL}, "n_clicks"),
+    State("trades-view", "data"),
     prevent_initial_call=False
 )
 
-def update_live_trades(n_intervals, filter_value):
-    results = main.manager.get_all_results()
-
+def update_live_trades(n_intervals, filter_value, prev_clicks, next_clicks, sort_clicks, view):
     active_strategies = main.get_active_strategies()
-    results = {k: v for k, v in results.items() if k in active_strategies}
+    names = [r["name"] for r in main.manager.runners if r["name"] in active_strategies]
 
-    if not results:
+    if not names:
         default_options = [{"label": "All Strategies", "value": "all"}]
-        return default_options, "all", []
+        return default_options, "all", [], "", no_update
 
     options = [{"label": "All Strategies", "value": "all"}] + [
-        {"label": name, "value": name} for name in results.keys()
+        {"label": name, "value": name} for name in names
     ]
     if filter_value not in [opt["value"] for opt in options]:
         filter_value = "all"
+    strategy = None if filter_value == "all" else filter_value
+
+    view = dict(view or TRADES_VIEW)
+    triggered = ctx.triggered_id
+    if triggered == "trades-prev":
+        view["page"] -= 1
+    elif triggered == "trades-next":
+        view["page"] += 1
+    elif isinstance(triggered, dict) and triggered.get("type") == "trades-sort":
+        view["ascending"] = not view["ascending"] if view["sort"] == triggered["index"] else True
+        view["sort"] = triggered["index"]
+        view["page"] = 0
+    elif triggered == "trades-strategy-filter":
+        view["page"] = 0
+
+    # Only the visible page is rendered, the table is rebuilt only after new fills
+    table = main.manager.get_trade_table(names)
+    pages = table.pages(strategy=strategy)
+    view["page"] = min(max(view["page"], 0), pages - 1)
 
     rows = []
-    for strat, data in results.items():
-        if filter_value != "all" and strat != filter_value:
-            continue
-        trades = data["trade_history"]
-        if not trades.empty:
-            for _, log in trades.iterrows():
-                rows.append(html.Tr([
-                    html.Td(strat),
-                    html.Td(log["symbol"]),
-                    html.Td(html.Span(log["side"], className=f"tag {log['side'].lower()}")),
-                    html.Td(str(log["timestamp"])),
-                    html.Td(f"${log['price']:,.2f}"),
-                    html.Td(f"{log['quantity']:.4f}")
-                ]))
-
-    return options, filter_value, rows
+    trades = table.page(view["page"], strategy=strategy, sort=view["sort"], ascending=view["ascending"])
+    for log in trades.to_dict("records"):
+        rows.append(html.Tr([
+            html.Td(log["strategy"]),
+            html.Td(log["symbol"]),
+            html.Td(html.Span(log["side"], className=f"tag {log['side'].lower()}")),
+            html.Td(str(log["timestamp"])),
+            html.Td(f"${log['price']:,.2f}"),
+            html.Td(f"{log['quantity']:.4f}")
+        ]))
+
+    label = f"Page {view['page'] + 1} of {pages} ({table.count(strategy):,} trades)"
+    return options, filter_value, rows, label, view
 
 # === Update Metrics ===
 @callback(
@@ -317,7 +401,7 @@ def update_live_trades(n_intervals, filter_value):
 )
 
 def update_live_metrics(n_intervals):
-    results = main.manager.get_all_results()
+    results = main.manager.get_all_summaries()
     strategy_names = main.list_strategy_names()
     active_strategies = main.get_active_strategies()
 
@@ -336,7 +420,7 @@ def update_live_metrics(n_intervals):
                 html.P(f"Sharpe Ratio: {summary.get('Sharpe Ratio')}"),
                 html.P(f"Max Drawdown %: {summary.get('Max Drawdown %')}"),
                 html.P(f"Profit Factor: {summary.get('Profit Factor')}")
-            ])
+            ] + latency_lines(results[name].get("latency")))
         else:
             summaries.append([html.P("Metrics will appear here if strategy is running")])
 
@@ -372,4 +456,5 @@ def sync_strategy_toggles(n_clicks_list, toggle_ids):
         if clicks and clicks % 2 == 1:
             active.append(tid.get("index"))
     main.set_active_strategies(active)
-    return {"active_strategies": active}
\ No newline at end of file
+    main.reconfigure_live()
+    return {"active_strategies": active}
@@ -1,10 +1,33 @@
 from abc import ABC, abstractmethod
 
+# Action codes used by the vectorized signal contract
+HOLD = 0
+BUY = 1
+SELL = -1
+
 class BaseStrategy(ABC):
+    # How live testing runs generate_signals: 'inline' on the event loop, or in a
+    # dedicated 'thread' or 'process'. Signals that take longer than signal_deadline_ms
+    # from the bar or trade that triggered them are dropped instead of traded late.
+    # A 'process' worker keeps its own copy of the strategy, so any state generate_signals
+    # changes never reaches the live process: such strategies cannot be checkpointed and
+    # are refused when live testing runs with a checkpoint directory.
+    executor = 'thread'
+    signal_deadline_ms = 1000
+
     def __init__(self, name='BaseStrategy', max_lookback=1):
         self.name = name
         self.max_lookback = max_lookback
         
     @abstractmethod
     def generate_signals(self, data):
-        pass
\ No newline at end of file
+        pass
+
+    def generate_signals_vectorized(self, timestamps, opens, highs, lows, closes, volumes):
+        '''
+        Optional whole-array version of generate_signals used by the backtester.
+        Return (actions, allocations), two arrays the same length as closes where
+        actions[i] is BUY, SELL or HOLD for bar i and allocations[i] is the percent
+        to trade at closes[i]. Return None to fall back to per-bar generate_signals.
+        '''
+        return None
\ No newline at end of file
@@ -1,5 +1,7 @@
 import numpy as np
-from strats.base_strategy import BaseStrategy
+from numpy.lib.stride_tricks import sliding_window_view
+from data.bar_window import get_column
+from strats.base_strategy import BaseStrategy, BUY, SELL, HOLD
 
 class MeanReversionStrategy(BaseStrategy):
     def __init__(self, moving_average_window=10, threshold=0.005, buy_percent=0.01, sell_percent=1.0):
@@ -17,7 +19,7 @@ class MeanReversionStrategy(BaseStrategy):
         price = last_bar['close']
         ts = last_bar['timestamp']
 
-        closes = np.fromiter((d['close'] for d in data), dtype=float)
+        closes = get_column(data, 'close')
         ma = closes.mean()
         if ma == 0:
             return None
@@ -27,4 +29,27 @@ class MeanReversionStrategy(BaseStrategy):
             return (ts, price, 'BUY', self.buy_percent)
         elif deviation >= self.threshold:
             return (ts, price, 'SELL', self.sell_percent)
-        return None
\ No newline at end of file
+        return None
+
+    def generate_signals_vectorized(self, timestamps, opens, highs, lows, closes, volumes):
+        n = len(closes)
+        actions = np.full(n, HOLD, dtype=np.int8)
+        allocations = np.zeros(n, dtype=float)
+        if n < self.moving_average_window:
+            return actions, allocations
+
+        # ma[j] is the mean of the window ending at bar j + window - 1
+        ma = sliding_window_view(closes, self.moving_average_window).mean(axis=-1)
+        prices = closes[self.moving_average_window - 1:]
+        valid = ma != 0
+        deviation = np.zeros_like(ma)
+        deviation[valid] = (prices[valid] - ma[valid]) / ma[valid]
+
+        buys = valid & (deviation <= -self.threshold)
+        sells = valid & ~buys & (deviation >= self.threshold)
+        offset = self.moving_average_window - 1
+        actions[offset:][buys] = BUY
+        actions[offset:][sells] = SELL
+        allocations[offset:][buys] = self.buy_percent
+        allocations[offset:][sells] = self.sell_percent
+        return actions, allocations
\ No newline at end of file
@@ -1,5 +1,7 @@
 import numpy as np
-from strats.base_strategy import BaseStrategy
+from numpy.lib.stride_tricks import sliding_window_view
+from data.bar_window import get_column
+from strats.base_strategy import BaseStrategy, BUY, SELL, HOLD
 
 class MomentumBreakoutStrategy(BaseStrategy):
     def __init__(self, lookback_period=20, buy_percent=0.01, sell_percent=1.0):
@@ -16,7 +18,7 @@ class MomentumBreakoutStrategy(BaseStrategy):
         price = last_bar['close']
         ts = last_bar['timestamp']
 
-        closes = np.fromiter((d['close'] for d in data), dtype=float)
+        closes = get_column(data, 'close')
         recent_high = closes[-self.lookback_period:].max()
         recent_low = closes[-self.lookback_period:].min()
 
@@ -25,4 +27,26 @@ class MomentumBreakoutStrategy(BaseStrategy):
         elif price < recent_low:
             return (ts, price, 'SELL', self.sell_percent)
         
-        return None
\ No newline at end of file
+        return None
+
+    def generate_signals_vectorized(self, timestamps, opens, highs, lows, closes, volumes):
+        n = len(closes)
+        actions = np.full(n, HOLD, dtype=np.int8)
+        allocations = np.zeros(n, dtype=float)
+        if n < self.lookback_period:
+            return actions, allocations
+
+        # Same window as generate_signals, which includes the current bar
+        windows = sliding_window_view(closes, self.lookback_period)
+        recent_high = windows.max(axis=-1)
+        recent_low = windows.min(axis=-1)
+        prices = closes[self.lookback_period - 1:]
+
+        buys = prices > recent_high
+        sells = ~buys & (prices < recent_low)
+        offset = self.lookback_period - 1
+        actions[offset:][buys] = BUY
+        actions[offset:][sells] = SELL
+        allocations[offset:][buys] = self.buy_percent
+        allocations[offset:][sells] = self.sell_percent
+        return actions, allocations
\ No newline at end of file
@@ -1,5 +1,7 @@
 import numpy as np
-from strats.base_strategy import BaseStrategy
+from numpy.lib.stride_tricks import sliding_window_view
+from data.bar_window import get_column
+from strats.base_strategy import BaseStrategy, BUY, SELL, HOLD
 
 class MovingAverageCrossoverStrategy(BaseStrategy):
     def __init__(self, short_window=5, long_window=20, buy_percent=0.01, sell_percent=1.0):
@@ -17,7 +19,7 @@ class MovingAverageCrossoverStrategy(BaseStrategy):
         price = last_bar['close']
         ts = last_bar['timestamp']
 
-        closes = np.fromiter((d['close'] for d in data), dtype=float)
+        closes = get_column(data, 'close')
 
         short_ma = closes[-self.short_window:].mean()
         long_ma = closes[-self.long_window:].mean()
@@ -29,4 +31,25 @@ class MovingAverageCrossoverStrategy(BaseStrategy):
         elif short_ma < long_ma:
             return (ts, price, 'SELL', self.sell_percent)
 
-        return None
\ No newline at end of file
+        return None
+
+    def generate_signals_vectorized(self, timestamps, opens, highs, lows, closes, volumes):
+        n = len(closes)
+        actions = np.full(n, HOLD, dtype=np.int8)
+        allocations = np.zeros(n, dtype=float)
+        if n < self.long_window:
+            return actions, allocations
+
+        # Both averages are aligned to the bar that closes each long window
+        offset = self.long_window - 1
+        short_window = min(self.short_window, self.long_window)
+        short_ma = sliding_window_view(closes, short_window).mean(axis=-1)[offset - (short_window - 1):]
+        long_ma = sliding_window_view(closes, self.long_window).mean(axis=-1)
+
+        buys = short_ma > long_ma
+        sells = short_ma < long_ma
+        actions[offset:][buys] = BUY
+        actions[offset:][sells] = SELL
+        allocations[offset:][buys] = self.buy_percent
+        allocations[offset:][sells] = self.sell_percent
+        return actions, allocations
\ No newline at end of file